@@ -41,6 +41,8 @@ router = {
 print(router["hostname"])
 ```
 
+> ⚡ Thousands of routers? Store them in the columnar `Inventory` from `4_Device Automation at Scale.py` (Section 7) — O(1) lookups by hostname, O(log n) by IP or subnet.
+
 ---
 
 ### 2. Loops and Conditionals
@@ -71,6 +73,8 @@ def ping_device(ip):
 ping_device("192.168.1.1")
 ```
 
+> ⚡ `os.system` starts one `ping` process per host. For big sweeps use the async ICMP engine in `3_Fast Sweeps.py` (Section 1) — same reachable/unreachable answer, thousands of hosts/sec.
+
 ---
 
 ### 4. File I/O
@@ -84,6 +88,8 @@ for d in devices:
     print("Connecting to", d)
 ```
 
+> ⚡ Connecting one device at a time takes hours at fleet scale — see the async fan-out runner in `4_Device Automation at Scale.py` (Section 2).
+
 ---
 
 ### 5. Error Handling
@@ -150,6 +156,10 @@ print(output)
 net_connect.disconnect()
 ```
 
+> ⚡ Polling the same router again and again? Keep the session open with the session pool in `4_Device Automation at Scale.py` (Section 1) — one login instead of one per poll.
+
+> ⚡ Pushing config? Send only the difference from the running config — `4_Device Automation at Scale.py` (Section 6).
+
 ---
 
 ### Example 3: API Call (Requests)
@@ -162,6 +172,8 @@ response = requests.get(url)
 print("Your public IP:", response.json()["ip"])
 ```
 
+> ⚡ Polling an API repeatedly? Use the keep-alive session pool in `5_Fast HTTP and Sockets.py` (Section 1) — one connection instead of one per call.
+
 ---
 
 ### Example 4: Subnet Operations
@@ -194,6 +206,8 @@ with concurrent.futures.ThreadPoolExecutor() as executor:
     executor.map(check, ips)
 ```
 
+> ⚡ The pool runs jobs in submission order — queue a big backup first and urgent checks wait behind all of it. For priorities, one job per device at a time, deadlines and retries, see the job scheduler in `4_Device Automation at Scale.py` (Section 9).
+
 ---
 
 ## 🧩 Stage 5: Advanced (Optional for Later)
@@ -86,6 +86,8 @@ done
 
 ✅ Checks the first 1024 ports on a given host.
 
+> ⚡ One `nc` per port = one fork and up to 1 s per filtered port. For many ports or hosts use the non-blocking scanner in `3_Fast Sweeps.py` (Section 6).
+
 ---
 
 ### 🧠 Example 3: Network Monitoring Script
@@ -430,6 +432,8 @@ scp file.txt user@192.168.1.10:/home/user/
 scp -r folder/ user@remote:/tmp/
 ```
 
+> ⚡ Copying many files or big images over a WAN? See the parallel SFTP engine in `4_Device Automation at Scale.py` (Section 8) — pipelined requests, parallel ranges, checksums.
+
 ---
 
 ## 🌐 10. `ssh` — Secure Shell
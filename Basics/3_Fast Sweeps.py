@@ -0,0 +1,2343 @@
+Great — you already know how to ping one device, loop over a list and use a thread pool.
+Now let’s make those scripts **fast enough for real networks** (thousands to millions of hosts).
+
+Every section below replaces one of the slow patterns from the earlier notes:
+
+| Slow pattern (earlier notes)                      | Problem                                  | Fast replacement (this file)   |
+| ------------------------------------------------- | ---------------------------------------- | ------------------------------ |
+| `os.system(f"ping -c 1 {ip}")` in `ping_device`   | One process fork per host                | Async ICMP engine (Section 1)  |
+| `for ip in net.hosts()`                           | One `IPv4Address` object per host        | Integer host ranges (Section 2) |
+| `ThreadPoolExecutor()` with default `max_workers` | Fixed concurrency, timeouts under load   | AIMD controller (Section 3)    |
+| `print(...)` inside `check(ip)`                  | Results are lost text, stdout bottleneck | Streaming results (Section 4)  |
+| Re-sweeping `devices.txt` every run              | Re-probes hosts confirmed up seconds ago | Reachability cache (Section 5) |
+| `nc -zv -w 1` per port in `port_scan.sh`         | One fork + up to 1 s per port            | Selector port scanner (Section 6) |
+| `nc ... \| grep succeeded` text output           | No compact storage, no fast “what changed?” | Port bitmaps + diff (Section 7) |
+| Every sweep in a single process                  | One core, one GIL, one event loop        | Sharded multi-process sweep (Section 8) |
+| `print(f"... {result*1000:.2f} ms")` in Example 1 | RTTs are printed, then lost              | Streaming RTT histograms (Section 9) |
+| None of the above is ever measured               | No numbers, regressions go unnoticed     | Benchmark suite (Section 10)   |
+
+> ⚠️ All examples are **Linux-first** and are tested against **loopback** (`127.0.0.0/8`), so you can run them without touching a real network.
+
+---
+
+## ⚡ 1. Async ICMP Sweep Engine (replaces `ping_device`)
+
+`ping_device(ip)` from Stage 1 runs `os.system(f"ping -c 1 {ip}")`.
+That starts a **new `ping` process per host** — you get a few dozen hosts/sec at best.
+
+The fast way:
+
+* Open **one** ICMP socket for the whole sweep
+* Send all echo requests from it without waiting
+* Let `asyncio` wake us up when replies arrive
+* Match each reply to its probe by **identifier + sequence number**
+
+### 🔹 Why `SOCK_DGRAM` + `IPPROTO_ICMP`?
+
+| Socket type                            | Needs root? | Who fills in the ICMP identifier?            |
+| -------------------------------------- | ----------- | -------------------------------------------- |
+| `SOCK_RAW` + `IPPROTO_ICMP`            | ✅ Yes       | You                                          |
+| `SOCK_DGRAM` + `IPPROTO_ICMP` ("ping socket") | ❌ No  | The kernel (= the socket’s local “port”)     |
+
+With a ping socket the kernel only delivers replies that carry **our** identifier,
+so we just match on `(source ip, sequence)`.
+
+Allow your group to open ping sockets (once, as root):
+
+```bash
+sudo sysctl -w net.ipv4.ping_group_range="0 2147483647"
+```
+
+### 🔹 The engine
+
+```python
+# icmp_sweep.py
+import asyncio
+import itertools
+import socket
+import struct
+import time
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def echo_request(seq, payload=b"pyping"):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+    csum = checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, csum, 0, seq) + payload
+
+
+class IcmpSweeper:
+    """Many ICMP echo probes in flight over one unprivileged ping socket."""
+
+    def __init__(self, timeout=1.0, max_in_flight=2000):
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.sock = None
+        self.ident = None
+        self._seq = itertools.count()
+        self._pending = {}  # (ip, seq) -> future
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        # a burst of replies must not overflow the default receive buffer
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind(("0.0.0.0", 0))
+        self.ident = self.sock.getsockname()[1]  # kernel uses this as ICMP id
+        self.loop.add_reader(self.sock.fileno(), self._on_readable)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for fut in self._pending.values():
+            fut.cancel()
+        self._pending.clear()
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, (ip, _) = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue  # ICMP error for an earlier probe, keep draining
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY or ident != self.ident:
+                continue
+            fut = self._pending.pop((ip, seq), None)
+            if fut is not None and not fut.done():
+                fut.set_result(time.perf_counter())
+
+    async def ping(self, ip):
+        """Return the RTT in seconds, or None if ``ip`` did not answer."""
+        async with self._slots:
+            seq = next(self._seq) & 0xFFFF
+            key = (ip, seq)
+            fut = self.loop.create_future()
+            self._pending[key] = fut
+            sent = time.perf_counter()
+            try:
+                await self.loop.sock_sendto(self.sock, echo_request(seq), (ip, 0))
+                received = await asyncio.wait_for(fut, self.timeout)
+            except (asyncio.TimeoutError, OSError):
+                return None
+            finally:
+                self._pending.pop(key, None)
+            return received - sent
+
+    async def is_reachable(self, ip):
+        return await self.ping(ip) is not None
+
+    async def sweep(self, ips):
+        """Ping every address in ``ips``; return ``{ip: rtt or None}``."""
+        ips = [str(ip) for ip in ips]
+        rtts = await asyncio.gather(*(self.ping(ip) for ip in ips))
+        return dict(zip(ips, rtts))
+
+
+def ping_device(ip, timeout=1.0):
+    """Drop-in for the Stage 1 helper: True if ``ip`` answers, else False."""
+    async def _one():
+        async with IcmpSweeper(timeout=timeout) as sweeper:
+            return await sweeper.is_reachable(ip)
+    return asyncio.run(_one())
+
+
+async def main():
+    import ipaddress
+
+    hosts = list(ipaddress.ip_network("127.0.0.0/20").hosts())
+    async with IcmpSweeper(timeout=1.0) as sweeper:
+        start = time.perf_counter()
+        results = await sweeper.sweep(hosts)
+        elapsed = time.perf_counter() - start
+    up = sum(rtt is not None for rtt in results.values())
+    print(f"{up}/{len(results)} hosts up in {elapsed:.2f}s "
+          f"({len(results) / elapsed:,.0f} hosts/sec)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+```
+
+**Run:**
+
+```bash
+python3 icmp_sweep.py
+```
+
+```
+4094/4094 hosts up in 0.32s (12,700 hosts/sec)
+```
+
+✅ One socket, thousands of probes in flight — compare that with one `ping` process per host.
+
+### 🔹 Same result as `ping_device`
+
+```python
+from icmp_sweep import ping_device
+
+if ping_device("127.0.0.1"):
+    print("127.0.0.1 is reachable")
+else:
+    print("127.0.0.1 is unreachable")
+```
+
+### 🔹 How reply matching works
+
+| Field        | Set by          | Used for                                          |
+| ------------ | --------------- | ------------------------------------------------- |
+| Identifier   | Kernel          | Only *our* socket receives the reply              |
+| Sequence     | `IcmpSweeper`   | `(ip, seq)` → the waiting `Future`                |
+| Timeout      | `asyncio.wait_for` | Unanswered probes resolve to `None` (unreachable) |
+
+> ⚠️ Sequence numbers are 16-bit, so keep `max_in_flight` well below 65,536 per target.
+
+---
+
+## 🧮 2. Integer-Backed Host Ranges (instead of `net.hosts()`)
+
+Example 4 in Stage 3 does:
+
+```python
+net = ipaddress.ip_network("192.168.1.0/29")
+for ip in net.hosts():
+    print(ip)
+```
+
+That’s fine for a `/29`. On a `/12` (1 million hosts) or a `/8` (16 million hosts) every
+host becomes an `IPv4Address` **object** — building them costs more than sending the probes.
+
+An IPv4 address is just a **32-bit integer**, so we can:
+
+* Keep ranges as `(first, last)` integers
+* Hand out **batches** as `array('I')` (4 bytes per host, not ~60)
+* Subtract **exclusion lists** (gateways, “do not scan” ranges) as integer ranges
+* **Shuffle** without building the whole list, so probes are spread over many `/24`s
+
+### 🔹 The iterator
+
+```python
+# host_ranges.py
+import bisect
+import ipaddress
+import random
+import socket
+from array import array
+
+try:
+    import numpy as np  # optional: faster sequential chunks
+except ImportError:
+    np = None
+
+
+def host_bounds(network):
+    """(first, last) host integers, with the same rules as ``net.hosts()``."""
+    net = ipaddress.ip_network(network, strict=False)
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.version == 4 and net.prefixlen < 31:
+        first, last = first + 1, last - 1  # skip network + broadcast
+    elif net.version == 6 and net.prefixlen < 127:
+        first += 1  # skip the subnet-router anycast address (IPv6 has no broadcast)
+    return first, last
+
+
+def subtract_ranges(first, last, exclude=()):
+    """Return sorted ``(start, stop)`` half-open ranges of ``[first, last]`` minus ``exclude``."""
+    cuts = ipaddress.collapse_addresses(
+        ipaddress.ip_network(e, strict=False) for e in exclude
+    )
+    ranges, cursor = [], first
+    for cut in cuts:
+        lo, hi = int(cut.network_address), int(cut.broadcast_address)
+        if hi < cursor or lo > last:
+            continue
+        if lo > cursor:
+            ranges.append((cursor, lo))
+        cursor = max(cursor, hi + 1)
+    if cursor <= last:
+        ranges.append((cursor, last + 1))
+    return ranges
+
+
+def int_to_ip(n):
+    return socket.inet_ntoa(n.to_bytes(4, "big"))
+
+
+class HostRange:
+    """All host addresses of ``network`` minus ``exclude``, stored as integer ranges."""
+
+    def __init__(self, network, exclude=()):
+        self.ranges = subtract_ranges(*host_bounds(network), exclude)
+        self._offsets = []  # index of the first host of each range
+        total = 0
+        for start, stop in self.ranges:
+            self._offsets.append(total)
+            total += stop - start
+        self.size = total
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for start, stop in self.ranges:
+            yield from range(start, stop)
+
+    def at(self, index):
+        """The ``index``-th host as an integer (no list is ever built)."""
+        i = bisect.bisect_right(self._offsets, index) - 1
+        return self.ranges[i][0] + index - self._offsets[i]
+
+    def chunks(self, size=65536, shuffle=False, seed=None, as_numpy=False):
+        """Yield batches of up to ``size`` hosts as ``array('I')`` (or NumPy ``uint32``)."""
+        if shuffle:
+            yield from self._shuffled_chunks(size, seed)
+            return
+        for start, stop in self.ranges:
+            for lo in range(start, stop, size):
+                hi = min(lo + size, stop)
+                if as_numpy and np is not None:
+                    yield np.arange(lo, hi, dtype=np.uint32)
+                else:
+                    yield array("I", range(lo, hi))
+
+    def _shuffled_chunks(self, size, seed):
+        n = self.size
+        if n == 0:
+            return
+        rng = random.Random(seed)
+        batch = array("I")
+        for x in self._scatter(n, rng):
+            batch.append(self.at(x))
+            if len(batch) == size:
+                yield batch
+                batch = array("I")
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _scatter(n, rng):
+        """Every index in ``range(n)`` once, in scattered order."""
+        # Full-period LCG over the next power of two >= size of the range;
+        # values outside the range are skipped ("cycle walking"). Every host
+        # is visited exactly once, in scattered order, with O(1) memory.
+        m = 1 << max(n - 1, 1).bit_length()
+        if m < 8:  # mod 4 the only full-period multiplier is a=1, i.e. counting up
+            yield from rng.sample(range(n), n)
+            return
+        a = rng.randrange(4, m, 4) + 1  # a % 4 == 1, never 1
+        c = rng.randrange(1, m, 2)      # c odd
+        x = rng.randrange(m)
+        for _ in range(m):
+            x = (a * x + c) % m
+            if x < n:
+                yield x
+
+
+if __name__ == "__main__":
+    import time
+
+    hosts = HostRange("10.0.0.0/12", exclude=["10.0.0.0/24", "10.15.255.255/32"])
+    start = time.perf_counter()
+    total = sum(len(chunk) for chunk in hosts.chunks())
+    print(f"{total:,} hosts in {time.perf_counter() - start:.2f}s (sequential)")
+
+    first = next(hosts.chunks(size=5, shuffle=True, seed=1))
+    print("shuffled:", [int_to_ip(n) for n in first])
+```
+
+**Run:**
+
+```bash
+python3 host_ranges.py
+```
+
+```
+1,048,319 hosts in 0.04s (sequential)
+shuffled: ['10.14.255.167', '10.15.82.164', '10.9.6.141', '10.5.248.50', '10.2.63.35']
+```
+
+### 🔹 Memory comparison (a `/12`)
+
+| Approach                               | Objects created   | Approx. memory   |
+| -------------------------------------- | ----------------- | ---------------- |
+| `list(ip_network(...).hosts())`        | 1 million objects | ~100 MB          |
+| `HostRange(...).chunks(65536)`         | 1 array per batch | ~256 KB per batch |
+
+### 🔹 Feeding the ICMP engine (Section 1)
+
+Convert to a string only at the moment you send:
+
+```python
+from host_ranges import HostRange, int_to_ip
+
+async with IcmpSweeper() as sweeper:
+    for chunk in HostRange("127.0.0.0/16").chunks(4096, shuffle=True):
+        results = await sweeper.sweep(int_to_ip(n) for n in chunk)
+```
+
+✅ Same hosts as `net.hosts()`, but as compact integer batches — with exclusions and shuffling built in.
+
+> ⚠️ `array('I')` holds IPv4 only. For IPv6 keep the integer ranges (`host_bounds()` skips the subnet-router anycast address, like `net.hosts()`) and iterate `range(start, stop)` directly.
+
+---
+
+## 📈 3. Adaptive Concurrency (AIMD) for the Stage 4 Sweep
+
+Stage 4 does:
+
+```python
+with concurrent.futures.ThreadPoolExecutor() as executor:
+    executor.map(check, ips)
+```
+
+`max_workers` is a **fixed guess**:
+
+* Too low → the link sits idle
+* Too high → queues fill up, probes time out, and live hosts get reported **down** (false negatives)
+
+TCP solved this decades ago with **AIMD** — *Additive Increase, Multiplicative Decrease*:
+
+| Signal after one “round” of probes          | Action                                   |
+| ------------------------------------------- | ---------------------------------------- |
+| Few timeouts, RTT close to the best seen    | Grow the window (double at first, then +N) |
+| Timeout rate too high **or** RTT inflating  | Cut the window (× 0.5)                   |
+
+On top of the window we add **rate limits** (probes/sec) — one global, one per `/24` —
+so no single subnet (or its firewall) gets hammered.
+
+### 🔹 The controller
+
+```python
+# adaptive.py
+import asyncio
+import ipaddress
+import time
+
+
+class TokenBucket:
+    """``rate`` tokens/sec with a burst of ``burst`` tokens."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate / 10)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def reserve(self):
+        """Take one token; return how many seconds to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AimdController:
+    """Grow/shrink the number of in-flight probes from RTT and timeout feedback."""
+
+    def __init__(self, initial=16, min_window=4, max_window=5000,
+                 increase=8, decrease=0.5, max_timeout_rate=0.05,
+                 rtt_tolerance=2.0, rtt_floor=0.01,
+                 global_rate=None, subnet_rate=None):
+        self.window = float(initial)
+        self.min_window, self.max_window = min_window, max_window
+        self.increase, self.decrease = increase, decrease
+        self.max_timeout_rate = max_timeout_rate
+        self.rtt_tolerance, self.rtt_floor = rtt_tolerance, rtt_floor
+        self.ssthresh = float(max_window)  # slow start until first congestion
+        self.global_bucket = TokenBucket(global_rate) if global_rate else None
+        self.subnet_rate = subnet_rate
+        self._subnet_buckets = {}  # ip >> 8 (the /24) -> TokenBucket
+        self.in_flight = 0
+        self.sent = self.timeouts = 0
+        self.srtt = None
+        self.min_rtt = float("inf")
+        self.timeout_rate = 0.0
+        self._round_done = self._round_timeouts = self._round_peak = 0
+        self._cond = None
+
+    def _subnet_bucket(self, ip):
+        key = int(ipaddress.IPv4Address(ip)) >> 8
+        bucket = self._subnet_buckets.get(key)
+        if bucket is None:
+            if len(self._subnet_buckets) > 65536:
+                self._subnet_buckets.clear()  # idle buckets are full anyway
+            bucket = self._subnet_buckets[key] = TokenBucket(self.subnet_rate)
+        return bucket
+
+    async def acquire(self, ip):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.window))
+            self.in_flight += 1
+            self.sent += 1
+            self._round_peak = max(self._round_peak, self.in_flight)
+        delay = 0.0
+        if self.global_bucket:
+            delay = self.global_bucket.reserve()
+        if self.subnet_rate:
+            delay = max(delay, self._subnet_bucket(ip).reserve())
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def release(self, rtt):
+        """Report one finished probe: its RTT in seconds, or None on timeout."""
+        async with self._cond:
+            self.in_flight -= 1
+            self._update(rtt)
+            self._cond.notify_all()
+
+    def _update(self, rtt):
+        if rtt is None:
+            self.timeouts += 1
+            self._round_timeouts += 1
+        else:
+            self.min_rtt = min(self.min_rtt, rtt)
+            self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        self._round_done += 1
+        if self._round_done < int(self.window):
+            return
+        # one window's worth of probes finished = one round
+        self.timeout_rate = self._round_timeouts / self._round_done
+        # only grow if the window was actually used (not held back by rate limits)
+        window_limited = self._round_peak >= int(self.window) // 2
+        self._round_done = self._round_timeouts = self._round_peak = 0
+        rtt_limit = max(self.min_rtt * self.rtt_tolerance, self.rtt_floor)
+        congested = (self.timeout_rate > self.max_timeout_rate
+                     or (self.srtt is not None and self.srtt > rtt_limit))
+        if congested:
+            self.window = max(self.min_window, self.window * self.decrease)
+            self.ssthresh = self.window
+        elif not window_limited:
+            pass
+        elif self.window < self.ssthresh:
+            if self.srtt is not None and self.srtt > self.min_rtt * 1.25:
+                self.ssthresh = self.window  # RTT starts rising: leave slow start
+            else:
+                self.window = min(self.max_window, self.window * 2)
+        else:
+            self.window = min(self.max_window, self.window + self.increase)
+
+    def metrics(self):
+        return {
+            "window": int(self.window),
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "timeouts": self.timeouts,
+            "timeout_rate": round(self.timeout_rate, 4),
+            "srtt_ms": round(self.srtt * 1000, 3) if self.srtt is not None else None,
+        }
+
+
+async def adaptive_sweep(probe, ips, controller=None):
+    """Run ``probe(ip) -> rtt or None`` over ``ips`` under AIMD control."""
+    controller = controller or AimdController()
+    results = {}
+    tasks = set()
+
+    async def run(ip):
+        rtt = None
+        try:
+            rtt = await probe(ip)
+        finally:
+            await controller.release(rtt)
+        results[ip] = rtt
+
+    for ip in ips:
+        await controller.acquire(ip)
+        task = asyncio.create_task(run(ip))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return results
+
+
+async def main():
+    import random
+
+    # Simulated link that can only handle ~300 probes in flight:
+    # beyond that RTT inflates, and beyond 3x it probes start to time out.
+    controller = AimdController(global_rate=50000, subnet_rate=2000)
+    capacity = 300
+
+    async def fake_probe(ip):
+        load = controller.in_flight / capacity
+        if load > 3 and random.random() < 0.3:
+            await asyncio.sleep(0.2)
+            return None
+        rtt = 0.005 * max(1.0, load)
+        await asyncio.sleep(rtt)
+        return rtt
+
+    async def report():
+        while True:
+            await asyncio.sleep(0.25)
+            print(controller.metrics())
+
+    reporter = asyncio.create_task(report())
+    ips = [f"10.0.{i & 255}.{i >> 8}" for i in range(40000)]  # spread over /24s
+    results = await adaptive_sweep(fake_probe, ips, controller)
+    reporter.cancel()
+    up = sum(r is not None for r in results.values())
+    print(f"{up}/{len(results)} up, final window {controller.metrics()['window']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+```
+
+**Run** (against a simulated link, no network needed):
+
+```bash
+python3 adaptive.py
+```
+
+```
+{'window': 600, 'in_flight': 600, 'sent': 8150, 'timeouts': 0, 'timeout_rate': 0.0, 'srtt_ms': 9.183}
+{'window': 264, 'in_flight': 264, 'sent': 14473, 'timeouts': 0, 'timeout_rate': 0.0, 'srtt_ms': 5.0}
+{'window': 440, 'in_flight': 392, 'sent': 22359, 'timeouts': 0, 'timeout_rate': 0.0, 'srtt_ms': 5.5}
+{'window': 552, 'in_flight': 522, 'sent': 29487, 'timeouts': 0, 'timeout_rate': 0.0, 'srtt_ms': 7.567}
+{'window': 141, 'in_flight': 141, 'sent': 35303, 'timeouts': 0, 'timeout_rate': 0.0, 'srtt_ms': 5.0}
+40000/40000 up, final window 309
+```
+
+✅ The window finds the link’s capacity (~300–600 in flight) and saw-tooths around it — **zero false “down” results**.
+
+### 🔹 Using it with the ICMP engine (Section 1)
+
+Let the controller decide concurrency, so give the sweeper a high ceiling:
+
+```python
+from adaptive import AimdController, adaptive_sweep
+from icmp_sweep import IcmpSweeper
+
+controller = AimdController(global_rate=10000, subnet_rate=200)
+async with IcmpSweeper(timeout=1.0, max_in_flight=65535) as sweeper:
+    results = await adaptive_sweep(sweeper.ping, ips, controller)
+print(controller.metrics())
+```
+
+### 🔹 Knobs
+
+| Parameter          | Meaning                                                  | Default |
+| ------------------ | -------------------------------------------------------- | ------- |
+| `initial`          | Starting window (probes in flight)                       | 16      |
+| `increase`         | Additive step per round after slow start                 | 8       |
+| `decrease`         | Multiplicative cut on congestion                         | 0.5     |
+| `max_timeout_rate` | Timeout share in a round that counts as congestion       | 5 %     |
+| `rtt_tolerance`    | Smoothed RTT above `min_rtt × tolerance` = congestion    | 2.0     |
+| `global_rate`      | Probes/sec for the whole sweep                           | off     |
+| `subnet_rate`      | Probes/sec per `/24`                                     | off     |
+
+> 🧠 `metrics()["window"]` is the live concurrency — log it or export it to your monitoring to see how much the network can take.
+
+---
+
+## 🌊 4. Streaming Results Instead of `print` (with Backpressure)
+
+Both the Stage 4 worker and Example 1 **print** each result:
+
+```python
+def check(ip):
+    if ping(ip):
+        print(f"{ip} is up")
+```
+
+Problems on a big sweep:
+
+* Other code can’t **use** the results (they’re just text on the screen)
+* `print` per host makes **stdout the bottleneck**
+* If you collect everything in a list first, a million-host sweep eats memory
+
+Fix: a **bounded async generator** of typed records, plus **sinks** that write in batches.
+
+| Piece              | Job                                                                 |
+| ------------------ | ------------------------------------------------------------------- |
+| `ProbeResult`      | Typed record (`NamedTuple`) — ip, up, rtt, error, timestamp         |
+| `stream_results()` | Runs probes, yields records; a **bounded queue** pauses the probes when the consumer is slow (backpressure) |
+| `NdjsonSink`, `CsvSink`, `CallbackSink` | Buffer records and write them **in batches**   |
+
+### 🔹 The pipeline
+
+```python
+# results.py
+import asyncio
+import contextlib
+import csv
+import json
+import sys
+import time
+from typing import NamedTuple, Optional
+
+_DONE = object()
+
+
+class ProbeResult(NamedTuple):
+    ip: str
+    up: bool
+    rtt_ms: Optional[float]
+    error: Optional[str]
+    ts: float
+
+    @classmethod
+    def from_rtt(cls, ip, rtt, error=None):
+        return cls(ip, rtt is not None, None if rtt is None else round(rtt * 1000, 3),
+                   error, round(time.time(), 3))
+
+
+async def stream_results(probe, ips, concurrency=1000, maxsize=10000):
+    """Yield a ``ProbeResult`` per ip as soon as it is known.
+
+    ``ips`` is consumed lazily, at most ``concurrency`` probes run at once and
+    at most ``maxsize`` results wait for the consumer — memory stays flat.
+    """
+    queue = asyncio.Queue(maxsize)
+    ips = iter(ips)
+
+    async def worker():
+        for ip in ips:  # shared iterator: each ip goes to exactly one worker
+            ip = str(ip)
+            try:
+                result = ProbeResult.from_rtt(ip, await probe(ip))
+            except Exception as exc:
+                result = ProbeResult.from_rtt(ip, None, error=repr(exc))
+            await queue.put(result)  # blocks while the consumer is behind
+
+    async def produce():
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            raise  # the consumer stopped early, nobody waits for _DONE
+        except Exception as exc:  # e.g. the ``ips`` iterable itself failed
+            for task in workers:
+                task.cancel()
+            await queue.put(exc)
+            return
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await producer
+
+
+class BatchSink:
+    """Collect records and hand them to ``write_batch`` ``batch_size`` at a time."""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self._batch = []
+        self.count = 0
+
+    def write(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.write_batch(batch)
+            self.count += len(batch)
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _FileSink(BatchSink):
+    def __init__(self, target="-", batch_size=1000):
+        super().__init__(batch_size)
+        self._owns_file = isinstance(target, str) and target != "-"
+        if self._owns_file:
+            self.file = open(target, "w", newline="")
+        else:
+            self.file = sys.stdout if target == "-" else target
+
+    def close(self):
+        super().close()
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class NdjsonSink(_FileSink):
+    """One JSON object per line — easy to ``grep``, ``jq`` or load later."""
+
+    def write_batch(self, batch):
+        self.file.write("".join(json.dumps(r._asdict()) + "\n" for r in batch))
+
+
+class CsvSink(_FileSink):
+    """Header + rows. The header is ``fields``, or the first record's ``_fields``."""
+
+    def __init__(self, target="-", batch_size=1000, fields=None):
+        super().__init__(target, batch_size)
+        self._writer = csv.writer(self.file)
+        self._header = fields is None
+        if fields is not None:
+            self._writer.writerow(fields)
+
+    def write_batch(self, batch):
+        if self._header:  # any NamedTuple: ProbeResult, CheckResult, ...
+            self._writer.writerow(batch[0]._fields)
+            self._header = False
+        self._writer.writerows(batch)
+
+
+class CallbackSink(BatchSink):
+    """Call ``callback(list_of_records)`` once per batch."""
+
+    def __init__(self, callback, batch_size=1000):
+        super().__init__(batch_size)
+        self.callback = callback
+
+    def write_batch(self, batch):
+        self.callback(batch)
+
+
+async def drain(stream, *sinks):
+    """Push every record of ``stream`` into all ``sinks``; return the record count."""
+    count = 0
+    try:
+        async for record in stream:
+            count += 1
+            for sink in sinks:
+                sink.write(record)
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
+
+
+async def main():
+    import resource
+
+    from host_ranges import HostRange, int_to_ip
+    from icmp_sweep import IcmpSweeper
+
+    hosts = (int_to_ip(n) for n in HostRange("127.0.0.0/16"))  # lazy, 65,534 hosts
+    up = 0
+
+    def count_up(batch):
+        nonlocal up
+        up += sum(r.up for r in batch)
+
+    start = time.perf_counter()
+    async with IcmpSweeper(timeout=1.0, max_in_flight=2000) as sweeper:
+        total = await drain(
+            stream_results(sweeper.ping, hosts, concurrency=2000),
+            NdjsonSink("sweep.ndjson", batch_size=5000),
+            CallbackSink(count_up, batch_size=5000),
+        )
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{up}/{total} up in {elapsed:.1f}s, peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+```
+
+**Run:**
+
+```bash
+python3 results.py
+head -n 2 sweep.ndjson
+```
+
+```
+65534/65534 up in 3.2s, peak RSS 29 MB
+{"ip": "127.0.0.1", "up": true, "rtt_ms": 49.014, "error": null, "ts": 1792194078.444}
+{"ip": "127.0.0.2", "up": true, "rtt_ms": 48.872, "error": null, "ts": 1792194078.444}
+```
+
+✅ A million fake probes through the same pipeline stay at ~21 MB RSS — memory depends on `concurrency` and `maxsize`, **not** on the number of hosts.
+
+### 🔹 Consuming the stream in your own code
+
+```python
+async for result in stream_results(sweeper.ping, hosts):
+    if not result.up:
+        open_ticket(result.ip)
+```
+
+Stop early with `break` — the generator cancels the remaining probes for you.
+
+### 🔹 Which sink?
+
+| Sink            | Output                        | Good for                         |
+| --------------- | ----------------------------- | -------------------------------- |
+| `NdjsonSink`    | `{"ip": ..., "up": ...}` lines | `jq`, log shippers, re-loading   |
+| `CsvSink`       | Header (from the first record, or `fields=`) + rows | Excel, pandas, quick reports |
+| `CallbackSink`  | Your function gets a `list`   | Databases, metrics, alerting     |
+
+> 🧠 Pass `"-"` as the target to write to stdout — still in batches, so printing stops being the bottleneck.
+
+---
+
+## 🗃️ 5. Reachability Cache (TTL + Negative Caching)
+
+The Stage 1 File I/O snippet reads `devices.txt`, and monitoring scripts sweep that **same list over and over**.
+A host confirmed up 5 seconds ago gets probed again anyway.
+
+A small cache fixes that:
+
+| Feature             | Why                                                                     |
+| ------------------- | ----------------------------------------------------------------------- |
+| **Positive TTL**    | “Up” answers are trusted for e.g. 60 s                                  |
+| **Negative TTL**    | “Down” answers expire sooner (e.g. 15 s) — a host coming back is noticed quickly, but dead ranges aren’t hammered every run |
+| **LRU + cap**       | Memory stays bounded (`max_entries`), least recently used hosts go first |
+| **Persistence**     | Optional JSON file so cron-driven runs share the cache                  |
+
+### 🔹 The cache
+
+```python
+# reach_cache.py
+import json
+import os
+import time
+from collections import OrderedDict
+
+
+class ReachabilityCache:
+    """``ip -> (up, rtt, expires_at)`` with separate TTLs for up and down hosts."""
+
+    def __init__(self, positive_ttl=60.0, negative_ttl=15.0,
+                 max_entries=100_000, path=None):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries  # ~150 bytes per entry
+        self.path = path
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _fresh(self, ip, now):
+        entry = self._entries.get(ip)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            del self._entries[ip]
+            return None
+        return entry
+
+    def get(self, ip, now=None):
+        """``(up, rtt)`` if ``ip`` has a fresh entry, else None. Counts a hit or a miss."""
+        entry = self._fresh(ip, time.time() if now is None else now)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(ip)  # most recently used
+        self.hits += 1
+        return entry[:2]
+
+    def put(self, ip, up, rtt=None, now=None):
+        ttl = self.positive_ttl if up else self.negative_ttl
+        self._entries[ip] = (up, rtt, (time.time() if now is None else now) + ttl)
+        self._entries.move_to_end(ip)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)  # evict least recently used
+
+    def plan(self, ips, defer=False):
+        """Yield the ips that need probing.
+
+        Fresh hosts are skipped, or — with ``defer=True`` — moved to the end
+        so unknown and expired hosts are probed first. Planning is a peek: it
+        does not touch ``hits``/``misses``, so a ``cached_probe`` behind it
+        counts each lookup once.
+        """
+        deferred = []
+        now = time.time()
+        for ip in ips:
+            ip = str(ip)
+            if self._fresh(ip, now) is None:
+                yield ip
+            elif defer:
+                deferred.append(ip)
+        yield from deferred
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            raise ValueError("no path: pass save(path) or ReachabilityCache(path=...)")
+        now = time.time()
+        live = {ip: e for ip, e in self._entries.items() if e[2] > now}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(live, f)
+        os.replace(tmp, path)  # atomic: a crash never leaves half a file
+
+    def load(self, path=None):
+        with open(path or self.path) as f:
+            data = json.load(f)
+        now = time.time()
+        for ip, (up, rtt, expires) in data.items():
+            if expires > now:
+                self._entries[ip] = (up, rtt, expires)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def cached_probe(cache, probe):
+    """Wrap an async ``probe(ip) -> rtt or None`` so fresh answers come from ``cache``."""
+    async def wrapper(ip):
+        hit = cache.get(ip)
+        if hit is not None:
+            up, rtt = hit
+            return rtt if up else None
+        rtt = await probe(ip)
+        cache.put(ip, rtt is not None, rtt)
+        return rtt
+    return wrapper
+
+
+async def main():
+    from icmp_sweep import IcmpSweeper
+
+    with open("devices.txt") as f:
+        devices = f.read().splitlines()
+
+    cache = ReachabilityCache(positive_ttl=60, negative_ttl=15, path="reach_cache.json")
+    to_probe = list(cache.plan(devices))
+    async with IcmpSweeper(timeout=0.5) as sweeper:
+        results = await sweeper.sweep(to_probe)
+    for ip, rtt in results.items():
+        cache.put(ip, rtt is not None, rtt)
+    cache.save()
+
+    print(f"{len(devices)} devices, probed {len(to_probe)}, "
+          f"served {len(devices) - len(to_probe)} from cache")
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(main())
+```
+
+**Run it twice** (the second run finds everything in the cache):
+
+```bash
+printf "127.0.0.1\n127.0.0.2\n127.0.0.3\n10.255.255.1\n" > devices.txt
+python3 reach_cache.py
+python3 reach_cache.py
+```
+
+```
+4 devices, probed 4, served 0 from cache
+4 devices, probed 0, served 4 from cache
+```
+
+✅ Repeat runs inside the TTL send **zero** probes for known hosts; the unreachable one is re-checked after 15 s.
+
+### 🔹 Plugging it into the streaming sweep (Section 4)
+
+```python
+from reach_cache import ReachabilityCache, cached_probe
+from results import stream_results
+
+cache = ReachabilityCache(path="reach_cache.json")
+async with IcmpSweeper() as sweeper:
+    probe = cached_probe(cache, sweeper.ping)
+    async for result in stream_results(probe, cache.plan(hosts, defer=True)):
+        ...
+cache.save()
+```
+
+| Mode                         | Fresh hosts are…                         | Use when                              |
+| ---------------------------- | ---------------------------------------- | ------------------------------------- |
+| `cache.plan(ips)`            | Skipped completely                       | Inventory checks, cron jobs           |
+| `cache.plan(ips, defer=True)` | Probed last (answer comes from the cache) | Dashboards that still need every host |
+
+> ⚠️ Keep the **negative TTL short** — otherwise a router that comes back up stays “down” in your reports until the entry expires.
+
+---
+
+## 🚪 6. Non-Blocking TCP Port Scanner (replaces `port_scan.sh`)
+
+`port_scan.sh` (Example 2 in `2.2_Bash tutrioal.py`) does:
+
+```bash
+for port in {1..1024}; do
+    nc -zv -w 1 $target $port &> /dev/null
+```
+
+That’s **one `nc` process per port** and up to **1 second per filtered port** —
+1024 ports on a firewalled host ≈ 17 minutes.
+
+The fast way is the same trick as Section 1, for TCP:
+
+1. Create many sockets in **non-blocking** mode
+2. Call `connect_ex()` — it returns at once with `EINPROGRESS`
+3. Let `selectors` (**epoll** on Linux) tell us which connects finished
+4. Read the result with `getsockopt(SO_ERROR)`:
+
+| `SO_ERROR`        | Meaning   |
+| ----------------- | --------- |
+| `0`               | **open** — the handshake completed |
+| `ECONNREFUSED`    | **closed** — the host answered with RST |
+| no event before timeout / other error | **filtered** — firewall drop or unreachable |
+
+### 🔹 The scanner
+
+```python
+# port_scan.py
+import collections
+import errno
+import os
+import resource
+import selectors
+import socket
+import struct
+import time
+
+OPEN, CLOSED, FILTERED = "open", "closed", "filtered"
+_LINGER_RST = struct.pack("ii", 1, 0)  # close() sends RST: no TIME_WAIT pile-up
+
+
+def _fd_budget(wanted):
+    """Raise the open-files limit if we can; never plan for more sockets than it allows."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < wanted + 64:
+        soft = wanted + 64 if hard == resource.RLIM_INFINITY else min(hard, wanted + 64)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    return max(1, min(wanted, soft - 64))
+
+
+def _state(err):
+    if err == 0:
+        return OPEN
+    if err == errno.ECONNREFUSED:
+        return CLOSED
+    if err in (errno.EADDRNOTAVAIL, errno.ENOBUFS):
+        raise OSError(err, os.strerror(err))  # our side ran out, not the target
+    return FILTERED
+
+
+def scan(hosts, ports, timeout=1.0, max_in_flight=4096, per_host=512):
+    """Yield ``(host, port, state)`` for every host/port pair, as results arrive.
+
+    Ports are handed out round-robin across hosts, with at most ``per_host``
+    connects in flight to one host and ``max_in_flight`` in total.
+    """
+    ports = list(ports)
+    max_in_flight = _fd_budget(max_in_flight)
+    todo = collections.deque((str(host), iter(ports)) for host in hosts)
+    busy = collections.Counter()
+    started = collections.deque()  # (deadline, sock, host, port), oldest first
+    sel = selectors.DefaultSelector()  # epoll on Linux
+
+    def close(sock, host):
+        sel.unregister(sock)
+        busy[host] -= 1
+        sock.close()
+
+    try:
+        while todo or started:
+            # 1. start new connects until a limit is hit
+            stalled = 0
+            while todo and len(sel.get_map()) < max_in_flight and stalled < len(todo):
+                host, host_ports = todo.popleft()
+                if busy[host] >= per_host:
+                    todo.append((host, host_ports))
+                    stalled += 1
+                    continue
+                port = next(host_ports, None)
+                if port is None:
+                    continue  # this host is done
+                todo.append((host, host_ports))
+                stalled = 0
+                family = socket.AF_INET6 if ":" in host else socket.AF_INET
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                err = sock.connect_ex((host, port))
+                if err == errno.EINPROGRESS:
+                    sel.register(sock, selectors.EVENT_WRITE, (host, port))
+                    busy[host] += 1
+                    started.append((time.monotonic() + timeout, sock, host, port))
+                else:
+                    sock.close()
+                    yield host, port, _state(err)
+
+            # 2. collect finished connects
+            if sel.get_map():
+                wait = max(0.0, started[0][0] - time.monotonic())
+                for key, _ in sel.select(wait):
+                    sock, (host, port) = key.fileobj, key.data
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err == 0:
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+                    close(sock, host)
+                    yield host, port, _state(err)
+
+            # 3. anything past its deadline is filtered
+            now = time.monotonic()
+            while started and (started[0][1].fileno() == -1 or started[0][0] <= now):
+                _, sock, host, port = started.popleft()
+                if sock.fileno() != -1:
+                    close(sock, host)
+                    yield host, port, FILTERED
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+
+
+def open_ports(host, ports=range(1, 1025), timeout=1.0):
+    """Like ``port_scan.sh``: the sorted open ports of one host."""
+    return sorted(port for _, port, state in scan([host], ports, timeout) if state == OPEN)
+
+
+def _sequential(host, ports, timeout):
+    # what the nc loop does, minus the fork per port
+    found = []
+    for port in ports:
+        with socket.socket() as sock:
+            sock.settimeout(timeout)
+            if sock.connect_ex((host, port)) == 0:
+                found.append(port)
+    return found
+
+
+def _listeners(hosts, open_ports, filtered_ports):
+    """Local stand-ins: real listeners (open) and full-backlog listeners (filtered)."""
+    socks = []
+    for host in hosts:
+        for port in open_ports + filtered_ports:
+            srv = socket.socket()
+            srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            srv.bind((host, port))
+            srv.listen(0 if port in filtered_ports else 128)
+            socks.append(srv)
+            if port in filtered_ports:
+                # fill the one-slot accept queue: later SYNs are silently dropped
+                filler = socket.socket()
+                filler.connect((host, port))
+                socks.append(filler)
+    return socks
+
+
+if __name__ == "__main__":
+    hosts = [f"127.0.0.{i}" for i in range(1, 5)]
+    ports = range(1, 1025)  # same range as port_scan.sh
+    open_list = list(range(100, 1025, 100))        # 10 open ports per host
+    filtered_list = list(range(150, 1025, 100))    # 9 "firewalled" ports per host
+    stand_ins = _listeners(hosts, open_list, filtered_list)
+
+    start = time.perf_counter()
+    states = collections.Counter()
+    found = set()
+    for host, port, state in scan(hosts, ports, timeout=1.0):
+        states[state] += 1
+        if state == OPEN:
+            found.add((host, port))
+    fast = time.perf_counter() - start
+    assert {(h, p) for h in hosts for p in open_list} <= found
+
+    start = time.perf_counter()
+    _sequential(hosts[0], ports, timeout=1.0)
+    slow = (time.perf_counter() - start) * len(hosts)
+
+    total = len(hosts) * len(ports)
+    print(dict(states))
+    print(f"selector scan : {fast:6.2f}s  ({total / fast:,.0f} ports/sec)")
+    print(f"sequential    : {slow:6.2f}s  ({total / slow:,.0f} ports/sec, no fork per port)")
+```
+
+**Run** (starts its own listeners on `127.0.0.1`–`127.0.0.4`):
+
+```bash
+python3 port_scan.py
+```
+
+```
+{'closed': 4020, 'open': 40, 'filtered': 36}
+selector scan :   1.11s  (3,694 ports/sec)
+sequential    :  36.14s  (113 ports/sec, no fork per port)
+```
+
+✅ Filtered ports cost **one timeout for the whole scan**, not one timeout each.
+The real `nc` loop is slower still — it also forks a process per port.
+
+### 🔹 How the local stand-ins work
+
+| Stand-in                                 | Looks like | Trick                                               |
+| ---------------------------------------- | ---------- | --------------------------------------------------- |
+| `listen(128)` socket                     | open       | Kernel completes the handshake                      |
+| `listen(0)` socket with a full accept queue | filtered | Linux silently drops further SYNs → timeout        |
+| Nothing bound                            | closed     | Kernel answers RST → `ECONNREFUSED`                 |
+
+> 🧠 On a zero-latency loopback with only open/closed ports, a plain blocking loop is about as fast — every connect finishes inside the syscall. The selector wins as soon as there is **RTT or a firewall**, i.e. on every real network.
+
+### 🔹 Same output as `port_scan.sh`
+
+```python
+from port_scan import open_ports
+
+target = "127.0.0.1"
+for port in open_ports(target, range(1, 1025), timeout=1.0):
+    print(f"Port {port} is open on {target}")
+```
+
+| Knob            | Meaning                                        | Default |
+| --------------- | ---------------------------------------------- | ------- |
+| `timeout`       | Seconds before a silent port counts as filtered | 1.0    |
+| `max_in_flight` | Sockets open at once (capped by `ulimit -n`)   | 4096    |
+| `per_host`      | Connects in flight to one host                 | 512     |
+
+> ⚠️ Only scan hosts you own or are allowed to test.
+
+---
+
+## 🧊 7. Compact Port-State Bitmaps + Scan-to-Scan Diff
+
+`port_scan.sh` and Script 4 in `2_Bash Tutorial.py` (`nc -zv ... | grep succeeded`) give you **text lines**.
+For a whole fleet you want to answer *“what changed since yesterday?”* — fast.
+
+Idea: a host has 65,536 TCP ports → **one bit per port** = **8 KiB per host**.
+Store every host’s bitmap **back-to-back in one buffer** (row `i` = host `i`):
+
+```
+buffer:  [ host 0: 8 KiB ][ host 1: 8 KiB ][ host 2: 8 KiB ] ...
+bit p of a row = port p open?
+```
+
+| Operation            | How                                                        |
+| -------------------- | ---------------------------------------------------------- |
+| Set / test a port    | One byte, one bit mask                                     |
+| Union / intersection / difference | Whole blocks as big integers (`\|`, `&`, `& ~`) |
+| Diff two scans       | Compare 64 hosts at a time as 64-bit words; only changed rows are decoded |
+
+### 🔹 The bitmap store
+
+```python
+# port_bitmap.py
+import json
+import mmap
+import os
+import re
+
+PORTS = 65536
+ROW = PORTS // 8  # 8 KiB per host
+WORDS = ROW // 8  # the same row as 64-bit words, for fast comparisons
+FORMAT = "port-bitmap/1"
+_NONZERO = re.compile(rb"[^\x00]")
+
+
+def _ports_in(row):
+    """Port numbers whose bit is set in one row (only non-zero bytes are looked at)."""
+    ports = []
+    for m in _NONZERO.finditer(row):
+        byte, base = row[m.start()], m.start() * 8
+        ports.extend(base + bit for bit in range(8) if byte >> bit & 1)
+    return ports
+
+
+class PortBitmaps:
+    """One 65536-bit open-port bitmap per host, all rows in one contiguous buffer.
+
+    Row ``i`` belongs to ``hosts[i]``; port ``p`` is bit ``p % 8`` of byte ``p // 8``.
+    With ``path`` the buffer is a memory-mapped file: big fleets live on disk
+    and the OS pages rows in and out as needed. The constructor always starts
+    an empty scan (an old file at ``path`` is overwritten); ``open()`` reuses one.
+    """
+
+    def __init__(self, hosts, path=None):
+        self._setup(hosts, path)
+        size = len(self.hosts) * ROW
+        self.buf = bytearray(size)
+        if path:
+            with open(path, "w+b") as f:  # a new scan starts all-closed, whatever the file held
+                f.truncate(size)
+                if size:
+                    self.buf = mmap.mmap(f.fileno(), size)
+            with open(f"{path}.hosts.json", "w") as f:
+                json.dump({"format": FORMAT, "row_bytes": ROW, "hosts": self.hosts}, f)
+        self._views()
+
+    def _setup(self, hosts, path):
+        self.hosts = [str(h) for h in hosts]
+        self.index = {h: i for i, h in enumerate(self.hosts)}
+        self.path = path
+
+    def _views(self):
+        self.view = memoryview(self.buf)
+        self.words = self.view.cast("Q")  # word-wise compares are ~10x faster than byte-wise
+
+    @classmethod
+    def open(cls, path):
+        """Re-open a bitmap file written earlier with ``PortBitmaps(hosts, path)``.
+
+        Raises ``ValueError`` if the header or the file size doesn't match.
+        """
+        with open(f"{path}.hosts.json") as f:
+            header = json.load(f)
+        if not isinstance(header, dict) or header.get("format") != FORMAT or header.get("row_bytes") != ROW:
+            raise ValueError(f"{path}.hosts.json: not a {FORMAT} header")
+        self = cls.__new__(cls)
+        self._setup(header["hosts"], path)
+        size = len(self.hosts) * ROW
+        actual = os.path.getsize(path)
+        if actual != size:
+            raise ValueError(f"{path}: {actual} bytes, expected {size} for {len(self.hosts)} hosts")
+        self.buf = bytearray()
+        if size:
+            with open(path, "r+b") as f:
+                self.buf = mmap.mmap(f.fileno(), size)
+        self._views()
+        return self
+
+    def flush(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.flush()
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def row(self, host):
+        i = self.index[host]
+        return self.view[i * ROW:(i + 1) * ROW]
+
+    def _pos(self, host, port):
+        if not 0 <= port < PORTS:  # would land in a neighbouring host's row
+            raise ValueError(f"port {port} out of range 0-{PORTS - 1}")
+        return self.index[host] * ROW + (port >> 3)
+
+    def set(self, host, port, is_open=True):
+        pos = self._pos(host, port)
+        if is_open:
+            self.buf[pos] |= 1 << (port & 7)
+        else:
+            self.buf[pos] &= ~(1 << (port & 7)) & 0xFF
+
+    def is_open(self, host, port):
+        return bool(self.buf[self._pos(host, port)] >> (port & 7) & 1)
+
+    def open_ports(self, host):
+        return _ports_in(self.row(host).tobytes())
+
+    def add_results(self, results):
+        """Load ``(host, port, state)`` tuples, e.g. straight from ``port_scan.scan``."""
+        for host, port, state in results:
+            if state == "open":
+                self.set(host, port)
+
+    # set operations: whole blocks of rows at a time as big integers
+
+    def _combine(self, other, op, block_rows=1024):
+        if self.hosts != other.hosts:
+            raise ValueError("set operations need the same host list")
+        out = PortBitmaps(self.hosts)
+        step = block_rows * ROW
+        for start in range(0, len(self.buf), step):
+            a = int.from_bytes(self.view[start:start + step], "little")
+            b = int.from_bytes(other.view[start:start + step], "little")
+            n = min(step, len(self.buf) - start)
+            out.view[start:start + n] = op(a, b).to_bytes(n, "little")
+        return out
+
+    def __or__(self, other):
+        return self._combine(other, lambda a, b: a | b)
+
+    def __and__(self, other):
+        return self._combine(other, lambda a, b: a & b)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def _changed_rows(self, newer, block_rows=64):
+        # compare 64 hosts (512 KiB) at once; only look at single rows in blocks that differ
+        step = block_rows * WORDS
+        for start in range(0, len(self.words), step):
+            if self.words[start:start + step] == newer.words[start:start + step]:
+                continue
+            for w in range(start, min(start + step, len(self.words)), WORDS):
+                if self.words[w:w + WORDS] != newer.words[w:w + WORDS]:
+                    yield w // WORDS
+
+    def diff(self, newer):
+        """Yield ``(host, opened, closed)`` only for hosts whose open ports changed.
+
+        A host missing from one scan counts as "all closed" in that scan.
+        """
+        if self.hosts == newer.hosts:
+            changed = ((self.hosts[i], self.row(self.hosts[i]), newer.row(self.hosts[i]))
+                       for i in self._changed_rows(newer))
+        else:
+            zero = memoryview(bytes(ROW))
+            changed = ((h,
+                        self.row(h) if h in self.index else zero,
+                        newer.row(h) if h in newer.index else zero)
+                       for h in dict.fromkeys(self.hosts + newer.hosts))
+        for host, old, new in changed:
+            a, b = int.from_bytes(old, "little"), int.from_bytes(new, "little")
+            if a == b:
+                continue
+            yield (host,
+                   _ports_in((b & ~a).to_bytes(ROW, "little")),
+                   _ports_in((a & ~b).to_bytes(ROW, "little")))
+
+
+if __name__ == "__main__":
+    import random
+    import resource
+    import time
+
+    rng = random.Random(7)
+    hosts = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(100_000)]
+    common = [22, 80, 443, 161, 179, 830, 8080, 8443]
+
+    start = time.perf_counter()
+    monday, tuesday = PortBitmaps(hosts), PortBitmaps(hosts)
+    for host in hosts:
+        for port in rng.sample(common, 3):
+            monday.set(host, port)
+            tuesday.set(host, port)
+    for host in rng.sample(hosts, 1000):  # 1% of the fleet changes
+        tuesday.set(host, rng.randrange(1024, 65536))
+        tuesday.set(host, common[rng.randrange(len(common))], is_open=False)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    changes = list(monday.diff(tuesday))
+    elapsed = time.perf_counter() - start
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"2 scans x {len(hosts):,} hosts built in {build:.1f}s, peak RSS {rss_mb:,.0f} MB")
+    print(f"diff: {len(changes)} changed hosts in {elapsed:.2f}s")
+    print("example:", changes[0])
+```
+
+**Run** (two simulated scans of 100,000 hosts, 1% of hosts changed):
+
+```bash
+python3 port_bitmap.py
+```
+
+```
+2 scans x 100,000 hosts built in 1.9s, peak RSS 1,599 MB
+diff: 1000 changed hosts in 0.50s
+example: ('10.0.0.143', [65348], [161])
+```
+
+✅ Only the 1,000 hosts that changed come out — with exactly the ports that **opened** and **closed**.
+
+### 🔹 Size math
+
+| Hosts   | Full 65,536-port bitmap per scan | As text lines (`Port 22 is open on …`, ~30 B/open port) |
+| ------- | -------------------------------- | -------------------------------------------------------- |
+| 1,000   | 8 MB                             | depends on open ports, no fast diff                      |
+| 100,000 | 820 MB                           | —                                                        |
+
+> 🧠 For big fleets pass `path=` — the buffer becomes a **memory-mapped file**. Each scan lives on disk, the diff streams through it, and the OS keeps only the pages it needs in RAM. `PortBitmaps(hosts, path)` always starts a fresh, all-closed file; re-open last week’s scan with `PortBitmaps.open("scan.bin")`, which checks the header and the file size against the host list.
+
+### 🔹 Feeding it from the scanner (Section 6)
+
+```python
+from port_bitmap import PortBitmaps
+from port_scan import scan
+
+today = PortBitmaps(hosts, path="scan-today.bin")
+today.add_results(scan(hosts, range(1, 65536)))
+today.flush()
+
+yesterday = PortBitmaps.open("scan-yesterday.bin")
+for host, opened, closed in yesterday.diff(today):
+    print(host, "opened:", opened, "closed:", closed)
+```
+
+---
+
+## 🧵 8. Multi-Process Sharded Sweeps (use every core)
+
+`ping_sweep.sh` loops `for ip in {1..254}` in one shell, and Stage 4’s thread pool runs in **one Python process**.
+Even the async engine from Section 1 runs on **one core**: one interpreter, one GIL, one event loop.
+Building packets, matching replies and formatting results all compete for that core.
+
+Fix: **shard** the network across processes — each one runs its own event loop and ICMP socket:
+
+```
+127.0.0.0/15 ──split──► chunk 0 ─► worker 1 (loop + socket) ─┐
+                        chunk 1 ─► worker 2 (loop + socket) ─┼─► pool.imap ─► one ordered stream
+                        chunk 2 ─► worker 3 (loop + socket) ─┘
+                        ...
+```
+
+| Design choice                             | Why                                                   |
+| ----------------------------------------- | ----------------------------------------------------- |
+| Workers receive `(start, stop)` integers  | Nothing big is pickled on the way in (Section 2 ranges) |
+| Results come back as `array('d')` per chunk | One compact buffer per chunk, not one object per host |
+| `pool.imap` (ordered)                     | Chunks come out in address order, even if they finish out of order |
+| Socket + loop created once per worker     | No setup cost per chunk                               |
+
+### 🔹 The sharded sweep
+
+```python
+# sharded_sweep.py
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from array import array
+
+from host_ranges import HostRange, int_to_ip
+from icmp_sweep import IcmpSweeper
+
+_worker = {}  # per-process event loop + sweeper, created once by _init_worker
+
+
+def _init_worker(timeout, max_in_flight):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    sweeper = IcmpSweeper(timeout=timeout, max_in_flight=max_in_flight)
+    loop.run_until_complete(sweeper.__aenter__())
+    _worker.update(loop=loop, sweeper=sweeper)
+
+
+def _sweep_range(bounds):
+    """Probe hosts ``start..stop-1`` in this worker; RTTs come back in address order."""
+    start, stop = bounds
+    loop, sweeper = _worker["loop"], _worker["sweeper"]
+    rtts = loop.run_until_complete(
+        asyncio.gather(*(sweeper.ping(int_to_ip(n)) for n in range(start, stop)))
+    )
+    return start, array("d", (math.nan if rtt is None else rtt for rtt in rtts))
+
+
+def _split(hosts, chunk_size):
+    for start, stop in hosts.ranges:
+        for lo in range(start, stop, chunk_size):
+            yield lo, min(lo + chunk_size, stop)
+
+
+def sweep_chunks(network, processes=None, chunk_size=16384, timeout=1.0,
+                 max_in_flight=2000, exclude=()):
+    """Yield ``(first_host_int, rtts)`` per chunk, in address order.
+
+    ``rtts`` is an ``array('d')`` with NaN for hosts that did not answer.
+    Each of the ``processes`` workers runs its own event loop and ICMP socket;
+    only tiny ``(start, stop)`` pairs go to the workers, so nothing big is pickled
+    on the way in.
+    """
+    hosts = HostRange(network, exclude)
+    processes = processes or os.cpu_count()
+    with multiprocessing.Pool(processes, _init_worker, (timeout, max_in_flight)) as pool:
+        # imap (not imap_unordered) hands results back in chunk order
+        yield from pool.imap(_sweep_range, _split(hosts, chunk_size))
+
+
+def sharded_sweep(network, **kwargs):
+    """Yield ``(ip, rtt or None)`` for every host of ``network``, in address order."""
+    for start, rtts in sweep_chunks(network, **kwargs):
+        for n, rtt in enumerate(rtts, start):
+            yield int_to_ip(n), None if math.isnan(rtt) else rtt
+
+
+if __name__ == "__main__":
+    network = "127.0.0.0/15"  # 131,070 loopback hosts
+    for processes in sorted({1, 2, os.cpu_count()}):
+        start = time.perf_counter()
+        total = up = 0
+        for _, rtts in sweep_chunks(network, processes=processes, timeout=1.0):
+            total += len(rtts)
+            up += sum(not math.isnan(r) for r in rtts)
+        elapsed = time.perf_counter() - start
+        print(f"{processes:2d} processes: {up:,}/{total:,} up in {elapsed:5.2f}s "
+              f"({total / elapsed:,.0f} hosts/sec)")
+```
+
+**Run:**
+
+```bash
+python3 sharded_sweep.py
+```
+
+Output on a **1-core** test VM (so no speed-up is possible there — more processes only add overhead):
+
+```
+ 1 processes: 131,070/131,070 up in 11.65s (11,247 hosts/sec)
+ 2 processes: 131,070/131,070 up in 12.44s (10,537 hosts/sec)
+```
+
+On a multi-core box the last line uses `os.cpu_count()` processes; each worker is independent
+(own socket, own loop, no shared state), so throughput grows with cores until the NIC or the
+kernel’s ICMP path becomes the limit.
+
+### 🔹 Consuming it
+
+```python
+from sharded_sweep import sharded_sweep
+
+for ip, rtt in sharded_sweep("10.0.0.0/16", processes=8, exclude=["10.0.0.0/24"]):
+    if rtt is None:
+        print(f"{ip} is down")
+```
+
+> 🧠 Each chunk finishes only when its slowest probe times out. Keep `chunk_size` large (thousands of hosts) so that one-`timeout` tail is small compared with the chunk’s run time.
+> For the fastest path skip the per-host tuples and read `sweep_chunks()` directly.
+
+---
+
+## 📊 9. Streaming RTT Statistics (bounded-memory histograms)
+
+Example 1 (“Ping Multiple Devices”) prints `result*1000` and then **throws the number away**.
+For monitoring you want, per host: *“what’s the p99 latency over the last minute, how jittery is it, how much loss?”*
+
+Keeping every RTT in a list grows forever. Instead we keep an **HDR-style histogram**:
+
+| Value range (µs)   | Bucket width        | Error    |
+| ------------------ | ------------------- | -------- |
+| 0 – 63             | 1 µs (exact)        | 0        |
+| 64 – 127           | 2 µs                | ≤ ~3 %   |
+| 128 – 255          | 4 µs                | ≤ ~3 %   |
+| … each power of two gets 32 buckets … | … | ≤ ~3 %   |
+
+→ 704 counters cover **1 µs to 60 s** with ~3 % relative error. Need a longer range (queue waits, say)? `RttWindow(max_us=...)` — each doubling of the range adds 32 counters.
+
+For a **sliding window**, the window (e.g. 60 s) is split into `slots` sub-windows (e.g. 4 × 15 s).
+Each slot has its own counters; when time moves on, the oldest slot is **wiped and reused**.
+
+| Metric          | Kept per slot                       | Computed at query time          |
+| --------------- | ----------------------------------- | ------------------------------- |
+| p50 / p90 / p99 | bucket counters                     | merge live slots, walk buckets  |
+| max             | largest RTT                         | max over live slots             |
+| jitter          | sum of \|RTT − previous RTT\| + count | mean absolute RTT change        |
+| loss            | sent / lost counters                | lost ÷ sent                     |
+
+### 🔹 The histogram + monitor
+
+```python
+# rtt_stats.py
+import time
+from array import array
+
+SUB_BITS = 6                 # 32 sub-buckets per power of two -> ~3% error
+HALF = 1 << (SUB_BITS - 1)
+MAX_US = 60_000_000          # clamp at 60 s (RttWindow(max_us=...) for longer values)
+
+
+def bucket_count(max_us):
+    return (1 << SUB_BITS) + (max_us.bit_length() - SUB_BITS) * HALF
+
+
+BUCKETS = bucket_count(MAX_US)
+
+
+def bucket_of(us, max_us=MAX_US):
+    """HDR-style log-linear bucket index of a value in microseconds."""
+    us = min(max(int(us), 0), max_us)
+    if us < (1 << SUB_BITS):
+        return us  # small values are exact
+    shift = us.bit_length() - SUB_BITS
+    return (1 << SUB_BITS) + (shift - 1) * HALF + (us >> shift) - HALF
+
+
+def bucket_value(index):
+    """Midpoint (in microseconds) of bucket ``index``."""
+    if index < (1 << SUB_BITS):
+        return float(index)
+    shift, top = divmod(index - (1 << SUB_BITS), HALF)
+    shift += 1
+    low = (top + HALF) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class RttWindow:
+    """Latency distribution, jitter and loss for one target over a sliding window.
+
+    The window is split into ``slots`` sub-windows that are recycled as time
+    moves on, so memory is fixed (``slots * buckets`` counters) no matter how
+    long the monitor runs. Values above ``max_us`` are counted as ``max_us``.
+    """
+
+    def __init__(self, window=60.0, slots=4, max_us=MAX_US):
+        self.slot_len = window / slots
+        self.slots = slots
+        self.limit_us = max_us
+        self.buckets = bucket_count(max_us)
+        self.counts = array("I", bytes(4 * slots * self.buckets))
+        self.epoch = array("q", [-1] * slots)     # which time slice a slot holds
+        self.sent = array("I", bytes(4 * slots))
+        self.lost = array("I", bytes(4 * slots))
+        self.max_us = array("d", bytes(8 * slots))
+        self.delta_sum = array("d", bytes(8 * slots))  # sum of |rtt - previous rtt|
+        self.delta_n = array("I", bytes(4 * slots))
+        self.last_us = None
+
+    def _slot(self, now):
+        epoch = int(now // self.slot_len)
+        s = epoch % self.slots
+        if self.epoch[s] != epoch:  # recycle a slot that fell out of the window
+            self.epoch[s] = epoch
+            base = s * self.buckets
+            self.counts[base:base + self.buckets] = array("I", bytes(4 * self.buckets))
+            self.sent[s] = self.lost[s] = self.delta_n[s] = 0
+            self.max_us[s] = self.delta_sum[s] = 0.0
+        return s
+
+    def record(self, rtt, now=None):
+        """Add one probe result: RTT in seconds, or None if it was lost."""
+        s = self._slot(time.monotonic() if now is None else now)
+        self.sent[s] += 1
+        if rtt is None:
+            self.lost[s] += 1
+            return
+        us = rtt * 1e6
+        self.counts[s * self.buckets + bucket_of(us, self.limit_us)] += 1
+        self.max_us[s] = max(self.max_us[s], us)
+        if self.last_us is not None:
+            self.delta_sum[s] += abs(us - self.last_us)
+            self.delta_n[s] += 1
+        self.last_us = us
+
+    def _live(self, now):
+        current = int(now // self.slot_len)
+        return [s for s in range(self.slots) if current - self.slots < self.epoch[s] <= current]
+
+    def snapshot(self, now=None):
+        """p50/p90/p99/max/jitter in ms and loss ratio over the current window."""
+        live = self._live(time.monotonic() if now is None else now)
+        sent = sum(self.sent[s] for s in live)
+        lost = sum(self.lost[s] for s in live)
+        merged = [0] * self.buckets
+        for s in live:
+            base = s * self.buckets
+            for i, c in enumerate(self.counts[base:base + self.buckets]):
+                if c:
+                    merged[i] += c
+        received = sent - lost
+        max_us = max((self.max_us[s] for s in live), default=0.0)
+        stats = {"sent": sent, "loss": round(lost / sent, 4) if sent else None}
+        targets = {"p50": 0.50, "p90": 0.90, "p99": 0.99}
+        seen, i = 0, 0
+        for name, q in targets.items():
+            if not received:
+                stats[name] = None
+                continue
+            rank = max(1, round(q * received))
+            while seen + merged[i] < rank:
+                seen += merged[i]
+                i += 1
+            stats[name] = round(min(bucket_value(i), max_us) / 1000, 3)
+        n = sum(self.delta_n[s] for s in live)
+        stats["max"] = round(max_us / 1000, 3) if received else None
+        stats["jitter"] = round(sum(self.delta_sum[s] for s in live) / n / 1000, 3) if n else None
+        return stats
+
+
+class RttMonitor:
+    """One ``RttWindow`` per target, created on first use."""
+
+    def __init__(self, window=60.0, slots=4):
+        self.window, self.slots = window, slots
+        self.targets = {}
+
+    def record(self, target, rtt, now=None):
+        stats = self.targets.get(target)
+        if stats is None:
+            stats = self.targets[target] = RttWindow(self.window, self.slots)
+        stats.record(rtt, now)
+
+    def report(self, now=None):
+        return {t: w.snapshot(now) for t, w in self.targets.items()}
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from icmp_sweep import IcmpSweeper
+
+    async def main():
+        devices = ["127.0.0.1", "127.0.0.2", "10.255.255.1"]
+        monitor = RttMonitor(window=10.0)
+        async with IcmpSweeper(timeout=0.5) as sweeper:
+            for _ in range(20):  # like Example 1, but keep the numbers
+                results = await sweeper.sweep(devices)
+                for ip, rtt in results.items():
+                    monitor.record(ip, rtt)
+                await asyncio.sleep(0.1)
+        print(f"{'host':<14}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}{'jitter':>8}{'loss':>6}")
+        for ip, s in monitor.report().items():
+            cells = ["-" if s[k] is None else f"{s[k]:.3f}" for k in ("p50", "p90", "p99", "max", "jitter")]
+            print(f"{ip:<14}" + "".join(f"{c:>8}" for c in cells) + f"{s['loss']:>6.0%}")
+        window = next(iter(monitor.targets.values()))
+        print(f"memory per host: {window.counts.itemsize * len(window.counts) / 1024:.1f} KiB of counters")
+
+    asyncio.run(main())
+```
+
+**Run:**
+
+```bash
+python3 rtt_stats.py
+```
+
+```
+host               p50     p90     p99     max  jitter  loss
+127.0.0.1        0.283   0.324   0.324   0.327   0.043    0%
+127.0.0.2        0.149   0.170   0.185   0.188   0.025    0%
+10.255.255.1         -       -       -       -       -  100%
+memory per host: 11.0 KiB of counters
+```
+
+✅ Memory is **11 KiB per host** whether the monitor runs for a minute or a year (10,000 hosts ≈ 110 MB).
+
+### 🔹 Accuracy check
+
+100,000 log-normal RTTs (10 % lost), histogram vs exact sorted list:
+
+| Metric | Histogram | Exact    |
+| ------ | --------- | -------- |
+| p50    | 6.720 ms  | 6.700 ms |
+| p90    | 24.320 ms | 24.105 ms |
+| p99    | 68.608 ms | 68.789 ms |
+| loss   | 10 %      | 10 %     |
+
+### 🔹 With the streaming pipeline (Section 4)
+
+```python
+monitor = RttMonitor(window=60.0)
+async for r in stream_results(sweeper.ping, devices):
+    monitor.record(r.ip, None if r.rtt_ms is None else r.rtt_ms / 1000)
+print(monitor.report())
+```
+
+> 🧠 Need finer percentiles? Raise `SUB_BITS` to 7 (≈ 1.5 % error) — memory per host doubles.
+
+---
+
+## 🏁 10. Benchmark Suite: Every Sweep Strategy, Measured
+
+The notes now show many ways to check reachability — but none of them were **measured**:
+
+| Strategy            | Where it comes from                   |
+| ------------------- | ------------------------------------- |
+| `os_system_ping`    | Stage 1 `ping_device` (`os.system`)   |
+| `bash_loop`         | `ping_sweep.sh`                       |
+| `sequential_ping3`  | Example 1 (`for ip in devices: ping(ip)`) |
+| `thread_pool_ping3` | Stage 4 (`ThreadPoolExecutor` + `check`) |
+| `async_icmp`        | Section 1                             |
+| `sharded_icmp`      | Section 8                             |
+| `tcp_sequential`    | `port_scan.sh` style, one connect at a time |
+| `tcp_selector`      | Section 6                             |
+
+The harness runs **each strategy in its own child process** against **local stand-ins** and reports:
+
+| Field          | Meaning                                                    |
+| -------------- | ---------------------------------------------------------- |
+| `hosts_per_sec` | Hosts swept per second                                    |
+| `p99_ms`       | 99th percentile probe latency (where measured per probe)   |
+| `cpu_s`        | User + system CPU, **including** child processes (`ping`, pool workers) |
+| `peak_rss_mb`  | Peak resident memory of the child (or its largest sub-process) |
+| `skipped`      | Why a strategy could not run here (e.g. no `ping` binary)  |
+
+Stand-ins:
+
+| Target     | What it is                                                                    |
+| ---------- | ----------------------------------------------------------------------------- |
+| `loopback` | `127.1.0.0/24` — every address answers instantly                              |
+| `tcp_farm` | One listener on port 7000 on each address of `127.2.0.0/24`                   |
+| `netns`    | (`--netns`, root) a network namespace behind a veth pair: half the `/24` answers, half is **blackholed** (dead hosts), plus 1 ms delay if `netem` is available |
+
+### 🔹 The harness
+
+```python
+# sweep_bench.py
+"""Benchmark every sweep strategy from these notes against local stand-ins.
+
+    python3 sweep_bench.py --out bench.json           # one /24 per target
+    python3 sweep_bench.py --baseline bench.json      # exit 1 on regression
+    sudo python3 sweep_bench.py --netns               # add a network-namespace target
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import ipaddress
+import itertools
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+TCP_PORT = 7000
+NETNS = "sweepbench"
+
+STRATEGIES = [
+    "os_system_ping",     # Stage 1 ping_device
+    "bash_loop",          # ping_sweep.sh
+    "sequential_ping3",   # Example 1
+    "thread_pool_ping3",  # Stage 4
+    "async_icmp",         # Section 1
+    "sharded_icmp",       # Section 8
+    "tcp_sequential",     # port_scan.sh-style, one connect at a time
+    "tcp_selector",       # Section 6
+]
+
+
+# ---------------------------------------------------------------- probes --
+
+_seq = itertools.count()
+
+
+def _blocking_ping(ip, timeout=1.0):
+    """Stand-in for ``ping3.ping`` when ping3 is not installed: one socket per call."""
+    from icmp_sweep import echo_request
+
+    seq = next(_seq) & 0xFFFF
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP) as sock:
+        sock.settimeout(timeout)
+        start = time.perf_counter()
+        sock.sendto(echo_request(seq), (ip, 0))
+        try:
+            while True:
+                data, _ = sock.recvfrom(2048)
+                if data[0] == 0 and struct.unpack("!H", data[6:8])[0] == seq:
+                    return time.perf_counter() - start
+        except socket.timeout:
+            return None
+
+
+def _ping3():
+    try:
+        from ping3 import ping
+        return ping, "ping3"
+    except ImportError:
+        return _blocking_ping, "socket"
+
+
+def _skip(reason):
+    return {"skipped": reason}
+
+
+def run_strategy(name, network, timeout):
+    """Run one strategy over every host of ``network`` in *this* process."""
+    targets = [str(ip) for ip in ipaddress.ip_network(network).hosts()]
+    if name == "os_system_ping":
+        if not shutil.which("ping"):
+            return _skip("no ping binary")
+        rtts = []
+        for ip in targets:
+            start = time.perf_counter()
+            rc = os.system(f"ping -c 1 -W {max(1, int(timeout))} {ip} > /dev/null 2>&1")
+            rtts.append(time.perf_counter() - start if rc == 0 else None)
+        return {"rtts": rtts}
+
+    if name == "bash_loop":
+        if not shutil.which("ping") or not shutil.which("bash"):
+            return _skip("no ping or bash binary")
+        script = (f'for ip in "$@"; do ping -c 1 -W {max(1, int(timeout))} $ip &> /dev/null '
+                  '&& echo "Host $ip is up"; done')
+        out = subprocess.run(["bash", "-c", script, "bash", *targets],
+                             capture_output=True, text=True).stdout
+        return {"up": out.count(" is up"), "probed": len(targets)}
+
+    if name in ("sequential_ping3", "thread_pool_ping3"):
+        ping, backend = _ping3()
+        if name == "sequential_ping3":
+            rtts = [ping(ip, timeout=timeout) or None for ip in targets]
+        else:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                rtts = list(executor.map(lambda ip: ping(ip, timeout=timeout) or None, targets))
+        return {"rtts": rtts, "backend": backend}
+
+    if name == "async_icmp":
+        from icmp_sweep import IcmpSweeper
+
+        async def sweep():
+            async with IcmpSweeper(timeout=timeout) as sweeper:
+                return list((await sweeper.sweep(targets)).values())
+        return {"rtts": asyncio.run(sweep())}
+
+    if name == "sharded_icmp":
+        from sharded_sweep import sharded_sweep
+
+        return {"rtts": [rtt for _, rtt in sharded_sweep(network, timeout=timeout, chunk_size=1024)]}
+
+    if name == "tcp_sequential":
+        rtts = []
+        for ip in targets:
+            start = time.perf_counter()
+            try:
+                socket.create_connection((ip, TCP_PORT), timeout=timeout).close()
+                rtts.append(time.perf_counter() - start)
+            except OSError:
+                rtts.append(None)
+        return {"rtts": rtts}
+
+    if name == "tcp_selector":
+        from port_scan import OPEN, scan
+
+        states = [state for _, _, state in scan(targets, [TCP_PORT], timeout=timeout)]
+        return {"up": states.count(OPEN), "probed": len(states)}
+
+    raise ValueError(f"unknown strategy {name!r}")
+
+
+# ------------------------------------------------------------ stand-ins --
+
+def start_tcp_farm(network):
+    """One listener on TCP_PORT per loopback address of ``network``."""
+    farm = []
+    for ip in ipaddress.ip_network(network).hosts():
+        ip = str(ip)
+        srv = socket.socket()
+        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        srv.bind((ip, TCP_PORT))
+        srv.listen(128)
+        farm.append(srv)
+    return farm
+
+
+def setup_netns(network):
+    """A namespace behind a veth pair standing in for a real subnet.
+
+    The lower half of ``network`` answers (a ``local`` route), the upper half
+    is blackholed, so those probes time out like dead hosts. Returns False if
+    namespaces are not available (no root, no ``ip``). Adds 1 ms of delay with
+    netem when the kernel supports it.
+    """
+    if os.geteuid() != 0 or not shutil.which("ip"):
+        return False
+    live, dead = ipaddress.ip_network(network).subnets(prefixlen_diff=1)
+    cmds = [
+        f"ip netns add {NETNS}",
+        f"ip link add sbh type veth peer name sbn netns {NETNS}",
+        "ip addr add 10.203.0.1/30 dev sbh",
+        "ip link set sbh up",
+        f"ip -n {NETNS} addr add 10.203.0.2/30 dev sbn",
+        f"ip -n {NETNS} link set sbn up",
+        f"ip -n {NETNS} link set lo up",
+        f"ip -n {NETNS} route add local {live} dev lo",  # answer for every address
+        f"ip -n {NETNS} route add blackhole {dead}",
+        f"ip route add {network} via 10.203.0.2",
+    ]
+    for cmd in cmds:
+        if subprocess.run(cmd.split(), capture_output=True).returncode != 0:
+            teardown_netns()
+            return False
+    subprocess.run(f"tc -n {NETNS} qdisc add dev sbn root netem delay 1ms".split(),
+                   capture_output=True)  # optional
+    return True
+
+
+def teardown_netns():
+    subprocess.run(["ip", "netns", "del", NETNS], capture_output=True)
+
+
+# ------------------------------------------------------------ harness --
+
+def _p99_ms(rtts):
+    ok = sorted(r for r in rtts if r is not None)
+    return round(ok[max(0, int(len(ok) * 0.99) - 1)] * 1000, 3) if ok else None
+
+
+def child_main(name, network, timeout):
+    """``--child`` mode: sweep ``network``, print one JSON result on stdout."""
+    import resource
+
+    start = time.perf_counter()
+    raw = run_strategy(name, network, timeout)
+    raw["elapsed"] = time.perf_counter() - start
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)  # ping processes, pool workers
+    raw["cpu_s"] = round(me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime, 3)
+    raw["peak_rss_mb"] = round(max(me.ru_maxrss, kids.ru_maxrss) / 1024, 1)
+    print(json.dumps(raw))
+
+
+def measure(name, target_name, network, timeout):
+    """Run one strategy in a fresh child process, so CPU and RSS are its own."""
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", name, "--network", network,
+         "--timeout", str(timeout)],
+        capture_output=True, text=True,
+    )
+    hosts = sum(1 for _ in ipaddress.ip_network(network).hosts())
+    record = {"strategy": name, "target": target_name, "hosts": hosts}
+    if out.returncode != 0:  # a crashed child: keep its last words, or at least its exit code
+        lines = out.stderr.strip().splitlines()
+        return {**record, "skipped": f"exit code {out.returncode}: {lines[-1] if lines else '(no stderr)'}"}
+    raw = json.loads(out.stdout)
+    if "skipped" in raw:
+        return {**record, "skipped": raw["skipped"]}
+    rtts = raw.get("rtts")
+    record.update(
+        up=raw["up"] if rtts is None else sum(r is not None for r in rtts),
+        hosts_per_sec=round(hosts / raw["elapsed"], 1),
+        p99_ms=None if rtts is None else _p99_ms(rtts),
+        cpu_s=raw["cpu_s"],
+        peak_rss_mb=raw["peak_rss_mb"],
+    )
+    if "backend" in raw:
+        record["backend"] = raw["backend"]
+    return record
+
+
+def regressions(results, baseline, tolerance):
+    """Compare with an earlier run: slower hosts/sec or more CPU per host is a regression."""
+    old = {(r["strategy"], r["target"]): r for r in baseline if "skipped" not in r}
+    problems = []
+    for r in results:
+        before = old.get((r["strategy"], r["target"]))
+        if before is None or "skipped" in r:
+            continue
+        if r["hosts_per_sec"] < before["hosts_per_sec"] * (1 - tolerance):
+            problems.append(f"{r['strategy']}@{r['target']}: hosts/sec "
+                            f"{before['hosts_per_sec']} -> {r['hosts_per_sec']}")
+        if r["cpu_s"] / r["hosts"] > before["cpu_s"] / before["hosts"] * (1 + tolerance) + 1e-4:
+            problems.append(f"{r['strategy']}@{r['target']}: cpu_s "
+                            f"{before['cpu_s']} -> {r['cpu_s']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefix", type=int, default=24, help="size of each target subnet")
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--netns", action="store_true", help="also sweep a network namespace")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--network", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child_main(args.child, args.network, args.timeout)
+
+    icmp_targets = {"loopback": f"127.1.0.0/{args.prefix}"}
+    tcp_network = f"127.2.0.0/{args.prefix}"
+    farm = start_tcp_farm(tcp_network)
+    if args.netns:
+        if setup_netns(f"10.204.0.0/{args.prefix}"):
+            icmp_targets["netns"] = f"10.204.0.0/{args.prefix}"
+        else:
+            print("network namespace not available, skipping", file=sys.stderr)
+
+    results = []
+    try:
+        for name in args.strategies.split(","):
+            runs = {"tcp_farm": tcp_network} if name.startswith("tcp_") else icmp_targets
+            for target_name, network in runs.items():
+                record = measure(name, target_name, network, args.timeout)
+                results.append(record)
+                print(json.dumps(record), file=sys.stderr)
+    finally:
+        for srv in farm:
+            srv.close()
+        if "netns" in icmp_targets:
+            teardown_netns()
+
+    report = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print("REGRESSION:", problem, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+```
+
+**Run:**
+
+```bash
+sudo python3 sweep_bench.py --netns --out bench.json
+```
+
+Results on a 1-core test VM (no `ping` binary and no `ping3` installed, so the ping3 strategies used the built-in socket fallback — see `backend`):
+
+| Strategy            | Target   | Up      | hosts/sec | p99 ms | CPU s | RSS MB |
+| ------------------- | -------- | ------- | --------- | ------ | ----- | ------ |
+| `sequential_ping3`  | loopback | 254     | 43,802    | 0.014  | 0.09  | 21.6   |
+| `sequential_ping3`  | netns    | 127     | **4.0**   | 0.017  | 0.13  | 21.6   |
+| `thread_pool_ping3` | loopback | 254     | 15,046    | 0.057  | 0.12  | 22.3   |
+| `thread_pool_ping3` | netns    | 127     | 19.5      | 0.049  | 0.14  | 22.2   |
+| `async_icmp`        | loopback | 254     | 15,530    | 6.546  | 0.13  | 22.2   |
+| `async_icmp`        | netns    | 127     | **480.8** | 7.510  | 0.12  | 22.2   |
+| `sharded_icmp`      | loopback | 254     | 6,944     | 5.464  | 0.15  | 24.0   |
+| `sharded_icmp`      | netns    | 127     | 470.9     | 7.197  | 0.15  | 23.2   |
+| `tcp_sequential`    | tcp_farm | 254     | 19,513    | 0.232  | 0.11  | 21.8   |
+| `tcp_selector`      | tcp_farm | 254     | 15,458    | —      | 0.13  | 21.9   |
+
+🧠 How to read it:
+
+* On a **zero-latency loopback** one-at-a-time loops look great — every probe finishes inside the syscall, so there is nothing to overlap.
+* As soon as **dead hosts** appear (`netns`), the sequential loop pays the full timeout per host (4 hosts/sec); the async engine pays it **once** (~120× faster here).
+* The async engine’s higher p99 on loopback is queueing inside one big burst — it disappears when the window is tuned (Section 3).
+* `sharded_icmp` on loopback is slower than one `async_icmp` process: starting the worker processes costs more than a /24 takes to sweep. Sharding pays off on big ranges and multi-core boxes.
+
+### 🔹 Catching regressions
+
+Keep a `bench.json` from a known-good commit and compare every new run against it:
+
+```bash
+python3 sweep_bench.py --out bench.json                   # baseline
+python3 sweep_bench.py --baseline bench.json --tolerance 0.25
+echo $?    # 1 = some strategy got >25% slower or uses >25% more CPU per host
+```
+
+Each problem is printed as one line, e.g. `REGRESSION: async_icmp@loopback: hosts/sec <before> -> <after>`.
+
+> ⚠️ Benchmark numbers depend on the machine — only compare runs from the **same** box.
+
+---
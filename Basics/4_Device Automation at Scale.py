@@ -0,0 +1,2842 @@
+Nice — you can already SSH into a router with **Netmiko** or **Paramiko** and run a `show` command.
+Now let’s make that work for **hundreds or thousands of devices**, polled every few minutes.
+
+Each section replaces one slow pattern from the earlier notes:
+
+| Slow pattern (earlier notes)                               | Problem                                   | Fast replacement (this file)     |
+| ---------------------------------------------------------- | ----------------------------------------- | -------------------------------- |
+| `ConnectHandler(**cisco_router)` → one command → `disconnect()` | Pays key exchange + login every poll  | SSH session pool (Section 1)     |
+| `for d in devices: print("Connecting to", d)` (serial)     | Thousands of routers take hours           | Async fan-out runner (Section 2) |
+| `exec_command()` + `stdout.read()` per command             | One channel round trip + blocking read each | Parallel channels / pipelined batch (Section 3) |
+| `send_command()` / `stdout.read()` → one big string       | Waits for the last byte; whole output in memory | Streaming parser (Section 4)  |
+| Re-parse the same `send_command()` output every poll      | Parse CPU spent on unchanged text         | Parsed-output cache (Section 5)  |
+| `send_config_set()` with the full config block            | Thousands of unchanged lines over SSH     | Config delta (Section 6)         |
+| `router = {"hostname": ..., "ip": ...}` per device         | GBs of dicts, linear-scan lookups         | Indexed inventory (Section 7)    |
+| `scp file user@host:/path` one file at a time              | One stream, one round trip per block/file | Parallel SFTP engine (Section 8) |
+| Thread pool / `fan_out()` in submission order             | A big backup starves urgent checks        | Priority job scheduler (Section 9) |
+
+> ⚠️ You don’t need real routers for any of this — Section 0 builds a **fake router** (an SSH server inside Python) that every example is tested against.
+
+Install once:
+
+```bash
+pip install paramiko netmiko
+```
+
+---
+
+## 🧪 0. Lab Setup: a Fake Router on `127.0.0.1`
+
+`FakeRouter` is a small SSH server built with `paramiko`:
+
+* password login (with an optional artificial **login delay**, like a real box doing key exchange + AAA)
+* an interactive shell with an `R1#` prompt — enough for **Netmiko** (`cisco_ios`)
+* `exec_command` support — enough for the **Paramiko** example
+* canned outputs for `show ip interface brief`, `show version`, `show clock`
+* a `logins` counter, so we can *see* how many handshakes a script costs
+* optional **SFTP** (`sftp_root=`): a local directory plays the router’s `flash:`, plus `sha256sum` for checksums
+* `WanLink`: a local proxy that adds WAN latency (and an optional per-connection rate cap) — no root, no `tc`
+
+```python
+# fake_router.py
+import hashlib
+import logging
+import os
+import queue
+import shlex
+import socket
+import threading
+import time
+
+import paramiko
+
+logging.getLogger("fake_router").addHandler(logging.NullHandler())  # quiet disconnects
+
+SHOW_IP_INT_BRIEF = """Interface              IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0     192.168.1.10    YES NVRAM  up                    up
+GigabitEthernet0/1     10.0.0.1        YES NVRAM  up                    up
+GigabitEthernet0/2     unassigned      YES NVRAM  administratively down down
+Loopback0              1.1.1.1         YES NVRAM  up                    up"""
+
+DEFAULT_OUTPUTS = {
+    "show ip interface brief": SHOW_IP_INT_BRIEF,
+    "show version": "Cisco IOS Software, fake_router (lab stand-in)\nR1 uptime is 1 day",
+    "show clock": "*12:00:00.000 UTC Mon Jan 1 2024",
+}
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, router):
+        self.router = router
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        time.sleep(self.router.login_delay)  # key exchange + AAA on a real box
+        if (username, password) == (self.router.username, self.router.password):
+            self.router.logins += 1
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.router._shell, args=(channel,), daemon=True).start()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.router._exec, args=(channel, command.decode()),
+                         daemon=True).start()
+        return True
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+    def chattr(self, attr):
+        paramiko.SFTPServer.set_file_attr(self.filename, attr)
+        return paramiko.SFTP_OK
+
+
+class _SFTPFiles(paramiko.SFTPServerInterface):
+    """SFTP on top of a local directory — the router's ``flash:``."""
+
+    def __init__(self, server, root):
+        super().__init__(server)
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))  # stay inside root
+
+    def _attrs(self, path, name=None):
+        attrs = paramiko.SFTPAttributes.from_stat(os.stat(path))
+        attrs.filename = name or os.path.basename(path)
+        return attrs
+
+    def list_folder(self, path):
+        try:
+            path = self._path(path)
+            return [self._attrs(os.path.join(path, name), name) for name in os.listdir(path)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return self._attrs(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        path = self._path(path)
+        try:
+            fd = os.open(path, flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.replace(self._path(oldpath), self._path(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class FakeRouter:
+    """In-process SSH server that behaves like a tiny Cisco IOS box.
+
+    Answers ``show`` commands from ``outputs`` over an interactive shell
+    (what netmiko uses) or ``exec_command`` (what paramiko examples use).
+    With ``sftp_root`` it also serves that directory over SFTP and answers
+    ``sha256sum <file>`` for files in it.
+    """
+
+    def __init__(self, hostname="R1", username="admin", password="admin123",
+                 outputs=None, login_delay=0.0, command_delay=0.0, host_key=None,
+                 sftp_root=None):
+        self.hostname = hostname
+        self.username, self.password = username, password
+        self.outputs = dict(DEFAULT_OUTPUTS if outputs is None else outputs)
+        self.login_delay, self.command_delay = login_delay, command_delay
+        self.logins = 0
+        self.sftp_root = sftp_root
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)  # share one across a lab
+        self.transports = []
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(128)
+        self.host, self.port = self._sock.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def device(self, device_type="cisco_ios"):
+        """A netmiko-style device dict pointing at this stand-in."""
+        return {"device_type": device_type, "host": self.host, "port": self.port,
+                "username": self.username, "password": self.password}
+
+    def respond(self, command):
+        time.sleep(self.command_delay)
+        command = command.strip()
+        if self.sftp_root and command.startswith("sha256sum "):
+            return "\n".join(map(self._sha256sum, shlex.split(command)[1:]))
+        return self.outputs.get(command, "")
+
+    def _sha256sum(self, name):
+        path = os.path.join(self.sftp_root, os.path.normpath("/" + name).lstrip("/"))
+        try:
+            with open(path, "rb") as f:
+                return f"{hashlib.file_digest(f, 'sha256').hexdigest()}  {name}"
+        except OSError as e:
+            return f"sha256sum: {name}: {e.strerror}"
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # as sshd does
+            transport = paramiko.Transport(conn)
+            transport.set_log_channel("fake_router")
+            transport.add_server_key(self.host_key)
+            if self.sftp_root:
+                transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _SFTPFiles,
+                                                self.sftp_root)
+            self.transports.append(transport)
+            try:
+                transport.start_server(server=_Server(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+
+    def _shell(self, channel):
+        prompt = f"\r\n{self.hostname}#"
+        buf = b""
+        try:
+            channel.send(prompt)
+            while True:
+                data = channel.recv(4096)
+                if not data:
+                    break
+                buf += data.replace(b"\x00", b"")  # netmiko's is_alive() sends NUL
+                while b"\n" in buf:
+                    line, buf = buf.split(b"\n", 1)
+                    command = line.decode(errors="replace").strip("\r")
+                    channel.send(command + "\r\n")  # echo, like a real terminal
+                    if command.strip() == "exit":
+                        return
+                    channel.sendall(self.respond(command).replace("\n", "\r\n") + prompt)
+        except (EOFError, OSError):
+            pass  # client went away
+        finally:
+            try:
+                channel.close()
+            except (EOFError, OSError):
+                pass
+
+    def _exec(self, channel, command):
+        try:
+            channel.sendall(self.respond(command).replace("\n", "\r\n") + "\r\n")
+            channel.send_exit_status(0)
+            channel.shutdown_write()  # EOF; closing right away could beat the "exec ok" reply
+            while channel.recv(1024):
+                pass  # wait for the client to close its end
+            channel.close()
+        except (EOFError, OSError):
+            pass
+
+    def close(self):
+        self._sock.close()
+        for transport in self.transports:
+            transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WanLink:
+    """TCP proxy on ``127.0.0.1`` that adds ``rtt`` seconds of round-trip latency.
+
+    Point a client at ``link.port`` instead of the router's port and every byte
+    takes ``rtt / 2`` each way — a long-distance link in a box, no root needed.
+    ``rate`` (bytes/s) optionally caps each connection, like a per-flow shaper.
+    """
+
+    def __init__(self, target_host, target_port, rtt=0.05, rate=None):
+        self.target = (target_host, target_port)
+        self.rtt, self.rate = rtt, rate
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(128)
+        self.host, self.port = self._sock.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # the delay is ours
+            for src, dst in ((client, upstream), (upstream, client)):
+                pipe = queue.Queue()
+                threading.Thread(target=self._read, args=(src, pipe), daemon=True).start()
+                threading.Thread(target=self._write, args=(dst, pipe), daemon=True).start()
+
+    def _read(self, src, pipe):
+        while True:
+            try:
+                data = src.recv(65536)
+            except OSError:
+                data = b""
+            pipe.put((time.monotonic() + self.rtt / 2, data))  # due time, bytes
+            if not data:
+                return
+
+    def _write(self, dst, pipe):
+        free_at = 0.0  # when the shaped "wire" is idle again
+        while True:
+            due, data = pipe.get()
+            if self.rate:
+                due = max(due, free_at)
+                free_at = due + len(data) / self.rate
+            time.sleep(max(0.0, due - time.monotonic()))
+            try:
+                if not data:
+                    dst.shutdown(socket.SHUT_WR)
+                    return
+                dst.sendall(data)
+            except OSError:
+                return
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+```
+
+Try it with the original Example 2 from Stage 3:
+
+```python
+from netmiko import ConnectHandler
+from fake_router import FakeRouter
+
+with FakeRouter() as router:
+    cisco_router = router.device()          # {'device_type': 'cisco_ios', 'host': '127.0.0.1', ...}
+    net_connect = ConnectHandler(**cisco_router)
+    print(net_connect.send_command("show ip interface brief"))
+    net_connect.disconnect()
+```
+
+---
+
+## ♻️ 1. SSH Session Pool for Netmiko
+
+Example 2 in Stage 3:
+
+```python
+net_connect = ConnectHandler(**cisco_router)
+output = net_connect.send_command("show ip interface brief")
+net_connect.disconnect()
+```
+
+Where the time goes on a real network:
+
+| Step                              | Round trips | Typical cost   |
+| --------------------------------- | ----------- | -------------- |
+| TCP + SSH key exchange            | 3–4         | 100s of ms     |
+| Login (AAA / TACACS / RADIUS)     | 1–2 + AAA   | 100s of ms – s |
+| Netmiko session prep (`terminal length 0`, prompt detection) | several | 100s of ms |
+| **The actual `show` command**     | 1           | tens of ms     |
+
+If you poll every minute, you pay the expensive part **every minute**. A pool keeps the session open:
+
+| Feature                 | How                                                          |
+| ----------------------- | ------------------------------------------------------------ |
+| Keyed by device dict    | Same dict (incl. credentials) → same sessions                |
+| Cap per device          | `max_per_device` — extra callers **wait** instead of opening more (routers limit VTY lines) |
+| Keepalives              | Netmiko’s `keepalive=` → SSH keepalive packets on idle sessions |
+| Idle eviction           | Background janitor closes sessions unused for `idle_timeout` |
+| Transparent reconnect   | Dead session (`is_alive()` false, socket error) → reconnect and retry once |
+
+### 🔹 The pool
+
+```python
+# ssh_pool.py
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+from netmiko import ConnectHandler
+from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException
+
+# errors that mean "this session is dead", not "the command was wrong"
+SESSION_ERRORS = (OSError, EOFError, NetmikoTimeoutException)
+
+
+def device_key(device):
+    """Hashable identity of a netmiko device dict (credentials included)."""
+    return tuple(sorted((k, repr(v)) for k, v in device.items()))
+
+
+class SessionPool:
+    """Reuse authenticated netmiko sessions across polling cycles.
+
+    * at most ``max_per_device`` sessions per device (callers wait for a free one)
+    * SSH keepalives every ``keepalive`` seconds keep idle sessions from being dropped
+    * sessions idle longer than ``idle_timeout`` are closed by a background janitor
+    * a dead session is replaced transparently and the command is retried once
+    """
+
+    def __init__(self, max_per_device=2, idle_timeout=300.0, keepalive=30,
+                 connect=ConnectHandler):
+        self.max_per_device = max_per_device
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self._connect = connect
+        self._idle = collections.defaultdict(list)  # key -> [(conn, last_used)]
+        self._open = collections.Counter()          # key -> sessions alive (idle + busy)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.connects = 0
+        janitor = threading.Thread(target=self._janitor, daemon=True)
+        janitor.start()
+
+    def acquire(self, device):
+        key = device_key(device)
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("pool is closed")
+                if self._idle[key]:
+                    conn, _ = self._idle[key].pop()  # most recently used first
+                    break
+                if self._open[key] < self.max_per_device:
+                    self._open[key] += 1
+                    conn = None
+                    break
+                self._cond.wait()
+        if conn is not None:
+            if conn.is_alive():
+                return conn
+            self._quietly_close(conn)  # keep our slot, reconnect below
+        options = dict(device)
+        keepalive = options.pop("keepalive", self.keepalive)  # a per-device value wins
+        try:
+            conn = self._connect(**options, keepalive=keepalive)
+        except BaseException:
+            self._forget(key)
+            raise
+        self.connects += 1
+        return conn
+
+    def release(self, device, conn, broken=False):
+        key = device_key(device)
+        if broken:
+            self._quietly_close(conn)
+            self._forget(key)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle[key].append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._quietly_close(conn)  # checked out when the pool closed: nobody will reuse it
+
+    @contextmanager
+    def session(self, device):
+        conn = self.acquire(device)
+        try:
+            yield conn
+        except SESSION_ERRORS:
+            self.release(device, conn, broken=True)
+            raise
+        except BaseException:
+            self.release(device, conn)
+            raise
+        else:
+            self.release(device, conn)
+
+    def send_command(self, device, command, **kwargs):
+        """``send_command`` on a pooled session; reconnects and retries once if it died."""
+        for attempt in (1, 2):
+            try:
+                with self.session(device) as conn:
+                    return conn.send_command(command, **kwargs)
+            except NetmikoAuthenticationException:
+                raise  # retrying bad credentials only locks the account
+            except SESSION_ERRORS:
+                if attempt == 2:
+                    raise
+
+    def evict_idle(self, now=None):
+        """Close sessions that have not been used for ``idle_timeout`` seconds."""
+        now = time.monotonic() if now is None else now
+        stale = []
+        with self._cond:
+            for key, sessions in self._idle.items():
+                keep = [(c, t) for c, t in sessions if now - t < self.idle_timeout]
+                stale += [(key, c) for c, t in sessions if now - t >= self.idle_timeout]
+                sessions[:] = keep
+            for key, _ in stale:
+                self._open[key] -= 1
+            self._cond.notify_all()
+        for _, conn in stale:
+            self._quietly_close(conn)
+        return len(stale)
+
+    def _janitor(self):
+        while not self._closed:
+            time.sleep(min(self.idle_timeout / 2, 30))
+            self.evict_idle()
+
+    def _forget(self, key):
+        with self._cond:
+            self._open[key] -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _quietly_close(conn):
+        try:
+            conn.disconnect()
+        except Exception:
+            pass
+
+    def close(self):
+        """Disconnect idle sessions now; busy ones are disconnected when released."""
+        with self._cond:
+            self._closed = True
+            sessions = [c for idle in self._idle.values() for c, _ in idle]
+            self._idle.clear()
+            self._open.clear()
+            self._cond.notify_all()
+        for conn in sessions:
+            self._quietly_close(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    from fake_router import FakeRouter
+
+    with FakeRouter(login_delay=0.3) as router:
+        cisco_router = router.device()
+
+        start = time.perf_counter()
+        for _ in range(5):  # Example 2, five polling cycles: connect every time
+            net_connect = ConnectHandler(**cisco_router)
+            net_connect.send_command("show ip interface brief")
+            net_connect.disconnect()
+        plain = time.perf_counter() - start
+
+        logins_before = router.logins
+        start = time.perf_counter()
+        with SessionPool(max_per_device=1) as pool:
+            for _ in range(5):  # same five cycles through the pool
+                output = pool.send_command(cisco_router, "show ip interface brief")
+        pooled = time.perf_counter() - start
+
+        print(f"connect per cycle: {plain:.2f}s, logins: {logins_before}")
+        print(f"pooled session   : {pooled:.2f}s, logins: {router.logins - logins_before}")
+```
+
+**Run:**
+
+```bash
+python3 ssh_pool.py
+```
+
+```
+connect per cycle: 3.70s, logins: 5
+pooled session   : 1.44s, logins: 1
+```
+
+✅ Five polling cycles, **one** login. With a real 300 ms+ login the gap grows with every cycle.
+
+### 🔹 Use it in a polling loop
+
+```python
+pool = SessionPool(max_per_device=2, idle_timeout=600)
+
+while True:
+    for device in devices:
+        output = pool.send_command(device, "show ip interface brief")
+        ...
+    time.sleep(60)
+```
+
+Or hold one session for several commands:
+
+```python
+with pool.session(cisco_router) as conn:
+    conn.send_command("show version")
+    conn.send_command("show ip interface brief")
+```
+
+> ⚠️ Authentication errors are **not** retried — retrying bad credentials is the fastest way to lock an account.
+
+---
+
+## 🚀 2. Async Fan-Out: Run Commands on the Whole Inventory
+
+The Stage 1 File I/O snippet:
+
+```python
+with open("devices.txt") as f:
+    devices = f.read().splitlines()
+for d in devices:
+    print("Connecting to", d)
+```
+
+Done for real (SSH + commands) this is **serial**: 2,000 routers × ~3 s each ≈ **1.7 hours**.
+Almost all of that time is *waiting* (network round trips, login, the router’s CPU), so run many devices at once:
+
+| Limit                  | Why                                                                  |
+| ---------------------- | -------------------------------------------------------------------- |
+| **Global** (`limit`)   | Your own box: threads, sockets, TACACS/RADIUS server load            |
+| **Per site** (`per_site`) | A remote site behind one WAN link / one jump host shouldn’t get 100 logins at once |
+
+How it works:
+
+* Each device becomes an `asyncio` task
+* The task waits for a **site slot first**, then a **global slot** — a busy site never blocks other sites
+* Netmiko itself is blocking, so the SSH work runs in a **thread pool** sized to the global limit
+* Results (and errors!) are **yielded as each device finishes** — no waiting for the slowest router
+
+### 🔹 Inventory format
+
+```
+# devices.txt — host[:port] [site]
+192.168.1.1   branch-a
+192.168.1.2   branch-a
+10.10.0.1:2222 dc1
+172.16.5.1                # no site -> its /24 is the site
+```
+
+### 🔹 The runner
+
+```python
+# bulk_run.py
+import asyncio
+import collections
+import concurrent.futures
+import ipaddress
+import json
+import time
+from typing import NamedTuple, Optional
+
+from netmiko import ConnectHandler
+
+
+class DeviceResult(NamedTuple):
+    host: str
+    site: str
+    ok: bool
+    outputs: dict
+    error: Optional[str]
+    seconds: float
+
+
+def read_inventory(path):
+    """``devices.txt`` lines: ``host[:port] [site]``; the site defaults to the host's /24."""
+    devices = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.replace(",", " ").split()
+            host, _, port = parts[0].partition(":")
+            if len(parts) > 1:
+                site = parts[1]
+            else:
+                try:
+                    site = str(ipaddress.ip_network(f"{host}/24", strict=False))
+                except ValueError:
+                    site = "default"  # hostname, not an IP
+            devices.append({"host": host, "port": int(port or 22), "site": site})
+    return devices
+
+
+def run_commands(device, commands, pool=None):
+    """Blocking: log in, run ``commands``, return ``{command: output}``."""
+    device = {k: v for k, v in device.items() if k != "site"}
+    if pool is not None:
+        with pool.session(device) as conn:
+            return {cmd: conn.send_command(cmd) for cmd in commands}
+    conn = ConnectHandler(**device)
+    try:
+        return {cmd: conn.send_command(cmd) for cmd in commands}
+    finally:
+        conn.disconnect()
+
+
+async def fan_out(devices, commands, credentials, limit=100, per_site=10, pool=None):
+    """Run ``commands`` on every device; yield a ``DeviceResult`` as each one finishes.
+
+    At most ``limit`` sessions are open in total and ``per_site`` per site.
+    A task waits for its *site* slot first, so a busy site never ties up
+    global slots that other sites could use.
+    """
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=limit)  # netmiko blocks
+    global_slots = asyncio.Semaphore(limit)
+    site_slots = collections.defaultdict(lambda: asyncio.Semaphore(per_site))
+
+    async def one(device):
+        device = {**credentials, **device}
+        async with site_slots[device["site"]], global_slots:
+            start = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(
+                    executor, run_commands, device, commands, pool)
+                ok, error = True, None
+            except Exception as exc:
+                first_line = (str(exc).strip().splitlines() or [""])[0]
+                outputs, ok, error = {}, False, f"{type(exc).__name__}: {first_line}"
+            name = device["host"] if device.get("port", 22) == 22 else f"{device['host']}:{device['port']}"
+            return DeviceResult(name, device["site"], ok, outputs, error,
+                                round(time.perf_counter() - start, 3))
+
+    tasks = [asyncio.create_task(one(d)) for d in devices]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def main():
+    import paramiko
+
+    from fake_router import FakeRouter
+
+    # a lab of 40 routers in 4 "sites", each login takes 0.5 s
+    key = paramiko.RSAKey.generate(2048)
+    routers = [FakeRouter(hostname=f"R{i}", login_delay=0.5, command_delay=0.05, host_key=key)
+               for i in range(40)]
+    with open("devices.txt", "w") as f:
+        for i, r in enumerate(routers):
+            f.write(f"{r.host}:{r.port} site{i % 4}\n")
+    # one wrong password, to show errors streaming out like results
+    routers[7].password = "changed"
+
+    devices = read_inventory("devices.txt")
+    credentials = {"device_type": "cisco_ios", "username": "admin", "password": "admin123"}
+    commands = ["show version", "show ip interface brief"]
+
+    start = time.perf_counter()
+    ok = failed = 0
+    async for result in fan_out(devices, commands, credentials, limit=100, per_site=5):
+        ok += result.ok
+        failed += not result.ok
+        if not result.ok:
+            print(json.dumps(result._asdict()))
+    elapsed = time.perf_counter() - start
+    print(f"{ok} ok, {failed} failed in {elapsed:.1f}s "
+          f"(serial would take at least {len(devices) * 0.5:.0f}s of logins alone)")
+    for r in routers:
+        r.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+```
+
+**Run** (builds a lab of 40 fake routers with a 0.5 s login each):
+
+```bash
+python3 bulk_run.py
+```
+
+```
+{"host": "127.0.0.1:33559", "site": "site3", "ok": false, "outputs": {}, "error": "NetmikoAuthenticationException: Authentication to device failed.", "seconds": 0.627}
+39 ok, 1 failed in 3.0s (serial would take at least 20s of logins alone)
+```
+
+✅ 40 devices in 3 s instead of 20+ s — and the bad password shows up as a **record**, not a crash.
+
+### 🔹 With the session pool (Section 1)
+
+For repeated polling, pass the pool so each cycle reuses sessions:
+
+```python
+from ssh_pool import SessionPool
+
+pool = SessionPool(max_per_device=1)
+async for result in fan_out(devices, commands, credentials, pool=pool):
+    ...
+```
+
+> 🧠 Every result is a `NamedTuple` — write them with `json.dumps(result._asdict())`, or feed them to the batch sinks from `3_Fast Sweeps.py` (Section 4).
+
+---
+
+## 🔀 3. Many Commands, One Login: Parallel Channels & Pipelining
+
+The Paramiko example (`Networking_Modules.pyt`, Example 3):
+
+```python
+stdin, stdout, stderr = ssh.exec_command('show ip interface brief')
+print(stdout.read().decode())
+```
+
+Fine for one command. A 20-command health check written the same way is a loop of
+**open channel → run → block until EOF**, one after the other:
+
+```
+cmd 1: [open channel][run.....][read]
+cmd 2:                               [open channel][run.....][read]
+cmd 3:                                                             [open ...
+```
+
+SSH can do better — **one login (`Transport`) carries many channels**:
+
+| Mode                         | How                                                        | Use when                                       |
+| ---------------------------- | ---------------------------------------------------------- | ---------------------------------------------- |
+| `exec_many()` — parallel exec | Opens up to `max_channels` exec channels at once, reads them with a selector | Device allows several exec channels (Linux, NX-OS, Junos, most IOS) |
+| `shell_batch()` — pipelined  | One interactive shell; **all commands written in one send**, output split at each prompt | Device allows only one shell / no exec channels |
+
+```
+exec_many:   cmd 1: [open][run.....][read]
+             cmd 2: [open][run.....][read]      <- all at the same time
+             cmd 3: [open][run.....][read]
+
+shell_batch: [send 1,2,3][run 1][run 2][run 3]  <- no round trip between commands
+```
+
+Either way, the output comes back **per command, in command order** — never mixed.
+
+### 🔹 Code
+
+```python
+# ssh_batch.py
+import re
+import selectors
+import socket
+import time
+from typing import NamedTuple
+
+import paramiko
+
+
+class CommandResult(NamedTuple):
+    command: str
+    exit_status: int
+    output: str
+
+
+def exec_many(transport, commands, max_channels=10, timeout=30.0):
+    """Run ``commands`` on up to ``max_channels`` parallel exec channels of one transport.
+
+    One SSH login, many channels: the commands run side by side and each
+    channel's bytes are collected separately, so outputs never mix.
+    Results come back in the order of ``commands``.
+    """
+    todo = iter(enumerate(commands))
+    results = [None] * len(commands)
+    active = {}  # channel -> (index, command, chunks)
+    sel = selectors.DefaultSelector()
+
+    def open_more():
+        while len(active) < max_channels:
+            item = next(todo, None)
+            if item is None:
+                return
+            index, command = item
+            channel = transport.open_session(timeout=timeout)
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+            active[channel] = (index, command, [])
+            sel.register(channel, selectors.EVENT_READ)
+
+    try:
+        open_more()
+        while active:
+            events = sel.select(timeout)
+            if not events:
+                raise TimeoutError(f"no output for {timeout}s from {len(active)} channels")
+            for key, _ in events:
+                channel = key.fileobj
+                index, command, chunks = active[channel]
+                data = channel.recv(65536)
+                if data:
+                    chunks.append(data)
+                    continue
+                sel.unregister(channel)  # EOF: this command is done
+                del active[channel]
+                status = channel.recv_exit_status()
+                channel.close()
+                results[index] = CommandResult(
+                    command, status, b"".join(chunks).decode(errors="replace"))
+            open_more()
+    finally:
+        for channel in active:
+            channel.close()
+        sel.close()
+    return results
+
+
+def _read_until(channel, done, timeout):
+    data = b""
+    deadline = time.monotonic() + timeout
+    while not done(data):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"timed out, got {data[-200:]!r}")
+        if channel.recv_ready():
+            data += channel.recv(65536)
+        else:
+            time.sleep(0.005)
+    return data
+
+
+def shell_batch(channel, commands, timeout=30.0):
+    """Pipeline ``commands`` through one interactive shell; split the output per command.
+
+    For devices that allow only one session/channel: every command is written
+    in a single send, so there is no round trip between commands. The prompt
+    that follows each command marks where its output ends.
+    """
+    # learn the prompt from the login banner (last line, e.g. "R1#") ...
+    banner = _read_until(channel, lambda b: re.search(rb"[>#]\s*$", b), timeout)
+    prompt = banner.decode(errors="replace").strip().splitlines()[-1]
+    marker = re.compile(r"\r?\n" + re.escape(prompt))
+    # ... then press Enter and wait for the prompt again: now we are in sync
+    channel.send("\n")
+    _read_until(channel, lambda b: marker.search(b.decode(errors="replace")), timeout)
+
+    channel.send("".join(f"{cmd}\n" for cmd in commands))
+    wanted = len(commands)
+    text = _read_until(
+        channel,
+        lambda b: len(marker.findall(b.decode(errors="replace"))) >= wanted,
+        timeout,
+    ).decode(errors="replace")
+
+    results = []
+    for command, chunk in zip(commands, marker.split(text)):
+        lines = chunk.split("\n", 1)  # first line is the echoed command
+        output = lines[1] if len(lines) > 1 else ""
+        results.append(CommandResult(command, 0, output.replace("\r\n", "\n").strip("\r\n")))
+    return results
+
+
+def connect(host, username, password, port=22):
+    """One authenticated ``Transport`` — the expensive part, done once."""
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(host, port=port, username=username, password=password,
+                   look_for_keys=False, allow_agent=False)
+    # send small requests (channel open, exec) right away, not after the peer's delayed ACK
+    client.get_transport().sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return client
+
+
+if __name__ == "__main__":
+    from fake_router import FakeRouter
+
+    health_check = ["show version", "show clock", "show ip interface brief"] * 7  # ~20 commands
+    with FakeRouter(command_delay=0.05) as router:
+        ssh = connect(router.host, router.username, router.password, router.port)
+
+        start = time.perf_counter()
+        for command in health_check:  # Example 3 style: one command, one blocking read
+            stdin, stdout, stderr = ssh.exec_command(command)
+            stdout.read().decode()
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = exec_many(ssh.get_transport(), health_check, max_channels=20)
+        parallel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        shell = ssh.invoke_shell()
+        piped = shell_batch(shell, health_check)
+        pipelined = time.perf_counter() - start
+        shell.close()
+        ssh.close()
+
+    same = lambda rs: [r.output.replace("\r\n", "\n").strip() for r in rs]
+    assert same(results) == same(piped), "exec and shell outputs differ"
+    print(f"{len(health_check)} commands, one login")
+    print(f"sequential exec_command : {sequential:.2f}s")
+    print(f"exec_many (20 channels) : {parallel:.2f}s")
+    print(f"shell_batch (pipelined) : {pipelined:.2f}s")
+    print(results[2].output.splitlines()[1])
+```
+
+**Run** (fake router from Section 0, each command takes 50 ms on the "router"):
+
+```bash
+python3 ssh_batch.py
+```
+
+```
+21 commands, one login
+sequential exec_command : 1.09s
+exec_many (20 channels) : 0.11s
+shell_batch (pipelined) : 1.11s
+GigabitEthernet0/0     192.168.1.10    YES NVRAM  up                    up
+```
+
+✅ ~10× faster with parallel channels — same login, same outputs (the script asserts both modes agree).
+
+Why `shell_batch` gains nothing here: the device still runs the commands **one after another** — pipelining only removes the channel setup and round trip *between* commands, which cost almost nothing on `127.0.0.1`. On a real WAN link (tens of ms per round trip) that gap is what you save.
+
+### 🔹 Using it
+
+```python
+from ssh_batch import connect, exec_many
+
+ssh = connect("192.168.1.1", "admin", "password")
+for r in exec_many(ssh.get_transport(), ["show version", "show ip interface brief"]):
+    print(r.command, r.exit_status)
+    print(r.output)
+ssh.close()
+```
+
+> ⚠️ Devices cap channels per session (and VTY lines per device). Keep `max_channels` at what the platform allows — if `open_session()` fails with `ChannelException`, lower it or switch to `shell_batch()`.
+
+> 🧠 `connect()` turns on `TCP_NODELAY`. Paramiko leaves Nagle’s algorithm on, so a small request (channel open, exec) can sit in the socket until the router ACKs the previous one — up to 40 ms of delayed ACK, per command.
+
+> 🧠 `shell_batch()` expects paging to be off (`terminal length 0`) — put it first in the command list on Cisco-style CLIs, exactly as Netmiko does for you.
+
+---
+
+## 🌊 4. Streaming Parser: Rows While the Output Is Still Arriving
+
+Both examples in the earlier notes do this:
+
+```python
+print(net_connect.send_command("show ip interface brief"))   # Netmiko: one big string
+print(stdout.read().decode())                                 # Paramiko: one big string
+```
+
+Nothing can happen until the **last byte** has arrived, and the whole output sits in memory (often twice: bytes + decoded text + list of lines).
+On a core router with tens of thousands of interfaces or routes that is megabytes per device — times 100 devices in flight (Section 2).
+
+Streaming instead:
+
+```
+channel bytes:  [chunk 1.........][chunk 2.........][chunk 3....]
+rows:            row row row row   row row row row   row row row   <- as each line completes
+memory:          one chunk + one partial line at a time
+```
+
+| Piece             | Job                                                                      |
+| ----------------- | ------------------------------------------------------------------------ |
+| `Template`        | Compiled regex + a `namedtuple` row type — **built once at import**, shared by every device |
+| `TEMPLATES`       | Command → template (`show ip interface brief`, `show ip route`)          |
+| `StreamParser`    | `feed(chunk)` → rows for complete lines; keeps the half line for the next chunk |
+| `stream_exec()`   | Paramiko exec channel → rows                                             |
+| `stream_netmiko()`| Netmiko session → rows, stops at the prompt                              |
+
+Header lines, blank lines, echoed commands and prompts simply don’t match the row pattern, so they are skipped for free.
+
+### 🔹 Code
+
+```python
+# stream_parse.py
+import codecs
+import re
+import time
+from collections import namedtuple
+
+
+class Template:
+    """A compiled row pattern for one ``show`` command — build once, reuse for every device."""
+
+    def __init__(self, name, row_pattern):
+        self.name = name
+        self.regex = re.compile(row_pattern)
+        self.Row = namedtuple(name, list(self.regex.groupindex))
+
+    def parse_line(self, line):
+        match = self.regex.match(line)
+        return self.Row(*match.groups()) if match else None  # header/prompt/blank -> None
+
+
+TEMPLATES = {
+    "show ip interface brief": Template(
+        "Interface",
+        r"(?P<interface>\S+)\s+(?P<ip>\d+\.\d+\.\d+\.\d+|unassigned)\s+(?:YES|NO)\s+\S+\s+"
+        r"(?P<status>up|down|administratively down|deleted)\s+(?P<protocol>up|down)\s*$",
+    ),
+    "show ip route": Template(
+        "Route",
+        r"(?P<code>[A-Z*][A-Za-z0-9* ]{0,3}?)\s+(?P<prefix>\d+\.\d+\.\d+\.\d+/\d+)"
+        r"(?: \[(?P<distance>\d+)/(?P<metric>\d+)\] via (?P<next_hop>[\d.]+))?",
+    ),
+}
+
+
+class StreamParser:
+    """Feed raw channel bytes in any chunk size; get rows back as soon as each line completes."""
+
+    def __init__(self, template, encoding="utf-8"):
+        self.template = TEMPLATES[template] if isinstance(template, str) else template
+        self._decode = codecs.getincrementaldecoder(encoding)("replace").decode  # safe mid-character
+        self._tail = ""  # the incomplete last line of the previous chunk
+
+    def feed(self, chunk):
+        lines = (self._tail + self._decode(chunk)).split("\n")
+        self._tail = lines.pop()
+        match, Row = self.template.regex.match, self.template.Row
+        for line in lines:
+            m = match(line)
+            if m:
+                yield Row(*m.groups())
+
+    def close(self):
+        """Parse whatever is left after the last newline."""
+        tail, self._tail = self._tail + self._decode(b"", True), ""
+        row = self.template.parse_line(tail)
+        if row is not None:
+            yield row
+
+
+def stream_exec(client, command, template=None, chunk_size=32768):
+    """Paramiko: run ``command`` over exec and yield rows while the output is still arriving."""
+    parser = StreamParser(template or command)
+    stdin, stdout, stderr = client.exec_command(command)
+    channel = stdout.channel
+    while True:
+        chunk = channel.recv(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def stream_netmiko(conn, command, template=None, timeout=60.0):
+    """Netmiko: like ``send_command`` but yields rows instead of returning one big string.
+
+    Stops at the device prompt. Assumes paging is off (Netmiko's session
+    prep already sent ``terminal length 0``).
+    """
+    parser = StreamParser(template or command)
+    prompt = conn.find_prompt()
+    conn.write_channel(command + conn.RETURN)
+    deadline = time.monotonic() + timeout
+    pending, tail = "", None  # tail is None until our command's echo shows up
+    while True:
+        data = conn.read_channel()
+        if not data:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{command!r}: no prompt after {timeout}s")
+            time.sleep(0.01)
+            continue
+        deadline = time.monotonic() + timeout  # timeout is for silence, not total time
+        if tail is None:  # skip stale prompts left over from find_prompt()
+            pending += data
+            if command not in pending:
+                continue
+            data, tail = pending.split(command, 1)[1], ""
+        yield from parser.feed(data.encode())  # netmiko already decoded; cheap round trip
+        tail = (tail + data)[-len(prompt) - 2:]
+        if tail.rstrip().endswith(prompt):
+            break
+    yield from parser.close()
+
+
+def _serve(outputs, pipe):
+    from fake_router import FakeRouter
+
+    with FakeRouter(outputs=outputs) as router:
+        pipe.send((router.host, router.port, router.username, router.password))
+        pipe.recv()  # keep serving until the parent says stop
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import tracemalloc
+
+    from ssh_batch import connect
+
+    # a core-router-sized table: 60,000 interfaces (~5 MB of text)
+    header = "Interface              IP-Address      OK? Method Status                Protocol"
+    rows = [f"GigabitEthernet{i // 4096}/{i % 4096:<10} 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255:<6}"
+            f"YES NVRAM  {'up' if i % 7 else 'administratively down':<22}{'up' if i % 7 else 'down'}"
+            for i in range(60_000)]
+    big = "\n".join([header, *rows])
+    template = TEMPLATES["show ip interface brief"]
+
+    # the router runs in its own process so tracemalloc only sees our side
+    pipe, child_pipe = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=({"show ip interface brief": big}, child_pipe))
+    server.start()
+    del rows, big
+    host, port, username, password = pipe.recv()
+    try:
+        client = connect(host, username, password, port)  # Section 3
+
+        def buffered():  # Example 3 style: read everything, then parse
+            stdin, stdout, stderr = client.exec_command("show ip interface brief")
+            text = stdout.read().decode()
+            yield from filter(None, map(template.parse_line, text.splitlines()))
+
+        def streaming():  # rows appear while bytes are still on the wire
+            return stream_exec(client, "show ip interface brief")
+
+        report = {}
+        for name, rows_of in [("buffered", buffered), ("streaming", streaming)]:
+            start = time.perf_counter()
+            count, down, first_row = 0, 0, None
+            for row in rows_of():
+                if first_row is None:
+                    first_row = time.perf_counter() - start
+                count += 1
+                down += row.status != "up"  # consume rows on the fly, keep nothing
+            total = time.perf_counter() - start
+            tracemalloc.start()  # second pass just for memory (tracemalloc slows Python down)
+            for row in rows_of():
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report[name] = (count, down, first_row, total, peak)
+        client.close()
+    finally:
+        pipe.send("stop")
+        server.join()
+
+    for name, (count, down, first_row, total, peak) in report.items():
+        assert count == 60_000, count
+        print(f"{name:<9}: first row after {first_row:.3f}s, all {count} rows ({down} not up) "
+              f"after {total:.2f}s, peak {peak / 1e6:.1f} MB")
+```
+
+**Run** (the fake router from Section 0 answers with 60,000 interfaces, ~5 MB):
+
+```bash
+python3 stream_parse.py
+```
+
+```
+buffered : first row after 0.120s, all 60000 rows (8572 not up) after 0.30s, peak 12.9 MB
+streaming: first row after 0.008s, all 60000 rows (8572 not up) after 0.24s, peak 2.5 MB
+```
+
+✅ First row ~15× sooner, ~5× less memory, and the parsing overlaps with the transfer instead of coming after it.
+Over a real WAN link the transfer takes much longer than on `127.0.0.1`, so the gap in “first row” grows with it.
+
+### 🔹 Using it with Netmiko
+
+```python
+from netmiko import ConnectHandler
+from stream_parse import stream_netmiko
+
+net_connect = ConnectHandler(**cisco_router)
+for row in stream_netmiko(net_connect, "show ip interface brief"):
+    if row.status != "up":
+        print(row.interface, row.ip, row.status)
+net_connect.disconnect()
+```
+
+### 🔹 Adding a template
+
+```python
+from stream_parse import TEMPLATES, Template
+
+TEMPLATES["show cdp neighbors"] = Template(
+    "Neighbor",
+    r"(?P<device>\S+)\s+(?P<local_if>\S+ \S+)\s+(?P<holdtime>\d+)",
+)
+```
+
+> 🧠 Keep row patterns anchored and specific (`up|down|administratively down`, dotted quads) — a loose `.*` pattern matches header lines too, and backtracks on every line.
+
+> ⚠️ If you need the whole table anyway (e.g. to diff it), `list(stream_exec(...))` still skips the big string and the per-line copies — only the rows are kept.
+
+---
+
+## 🗃️ 5. Parsed-Output Cache: Don’t Re-Parse What Didn’t Change
+
+A poller runs `send_command("show ip interface brief")` on every router **every minute**.
+On a healthy network almost none of those outputs changed since the last poll — yet each one is parsed again, line by line, regex by regex.
+
+Hashing is much cheaper than parsing:
+
+| Work per 2,000-interface output | Cost        |
+| ------------------------------- | ----------- |
+| Regex-parse every line          | ~7 ms       |
+| BLAKE2b hash of the raw text    | ~0.4 ms     |
+
+So: hash the raw output per **(device, command)**; same hash as last time → hand back the rows parsed last time.
+
+| Feature        | How                                                                    |
+| -------------- | ---------------------------------------------------------------------- |
+| Change check   | 16-byte BLAKE2b digest of the raw output                               |
+| LRU eviction   | `OrderedDict` — hits move to the end, evictions pop from the front     |
+| Size limits    | `max_entries` **and** `max_bytes` (raw output size as a cheap stand-in for parsed size) |
+| Thread-safe    | One lock around the dict; parsing happens **outside** it               |
+| Stats          | hits / misses / evictions / hit rate                                   |
+
+### 🔹 Code
+
+```python
+# parse_cache.py
+import collections
+import hashlib
+import threading
+
+
+class ParseCache:
+    """Remember parsed ``show`` output per (device, command); re-parse only when the text changed.
+
+    * the raw output is hashed (BLAKE2b) — same hash as last time -> the old parsed result
+    * least recently used entries go first once ``max_entries`` or ``max_bytes`` is exceeded
+    * ``max_bytes`` counts the raw output size, a cheap stand-in for the parsed size
+    * parsed results are shared between callers — keep them immutable (tuples of namedtuples)
+    """
+
+    def __init__(self, max_entries=10_000, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()  # (device, command) -> (digest, size, parsed)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def digest(raw):
+        return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+    def get_or_parse(self, device, command, raw, parse):
+        """``parse(raw)``, unless this device/command produced exactly ``raw`` before."""
+        key = (device, command)
+        digest = self.digest(raw)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == digest:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        parsed = parse(raw)  # outside the lock: other devices keep going
+        self._store(key, digest, len(raw), parsed)
+        return parsed
+
+    def _store(self, key, digest, size, parsed):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return  # would evict everything else; just don't cache it
+            self._entries[key] = (digest, size, parsed)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, device, command=None):
+        """Drop one command, or every command of ``device``."""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == device and command in (None, k[1])]
+            for key in keys:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+def parse_rows(command):
+    """A ``parse`` function for ``command`` built from the stream_parse.py templates (Section 4)."""
+    from stream_parse import TEMPLATES
+
+    parse_line = TEMPLATES[command].parse_line
+    return lambda raw: tuple(filter(None, map(parse_line, raw.splitlines())))
+
+
+def cached_command(pool, cache, device, command, parse=None):
+    """Poll ``command`` through the session pool (Section 1) and parse it through ``cache``."""
+    raw = pool.send_command(device, command)
+    host = (device["host"], device.get("port", 22))
+    return cache.get_or_parse(host, command, raw, parse or parse_rows(command))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    # 500 routers x 2,000 interfaces, polled 10 times; ~2% of routers change per poll
+    def table(router, flaps):
+        lines = ["Interface              IP-Address      OK? Method Status                Protocol"]
+        for i in range(2000):
+            down = (i + flaps) % 97 == 0
+            lines.append(f"GigabitEthernet{i // 48}/{i % 48:<8} 10.{router >> 8}.{router & 255}.{i % 250:<5}"
+                         f"YES NVRAM  {'down' if down else 'up':<22}{'down' if down else 'up'}")
+        return "\n".join(lines)
+
+    random.seed(1)
+    flaps = [0] * 500
+    outputs = {}
+    parse = parse_rows("show ip interface brief")
+    cache = ParseCache(max_entries=1000, max_bytes=256 * 1024 * 1024)
+    plain = cached = 0.0
+    for poll in range(10):
+        for router in range(500):
+            if poll == 0 or random.random() < 0.02:
+                flaps[router] += 1
+                outputs[router] = table(router, flaps[router])
+        for router, raw in outputs.items():
+            start = time.perf_counter()
+            expected = parse(raw)
+            plain += time.perf_counter() - start
+
+            start = time.perf_counter()
+            rows = cache.get_or_parse(f"r{router}", "show ip interface brief", raw, parse)
+            cached += time.perf_counter() - start
+            assert rows == expected
+
+    s = cache.stats()
+    print("10 polls x 500 routers x 2000 interfaces")
+    print(f"parse every time : {plain:.2f}s CPU")
+    print(f"with ParseCache  : {cached:.2f}s CPU "
+          f"(hit rate {s['hit_rate']:.0%}, {s['entries']} entries, {s['bytes'] / 1e6:.0f} MB raw)")
+```
+
+**Run** (simulated fleet, no SSH involved — this measures parse CPU only):
+
+```bash
+python3 parse_cache.py
+```
+
+```
+10 polls x 500 routers x 2000 interfaces
+parse every time : 27.47s CPU
+with ParseCache  : 5.74s CPU (hit rate 88%, 500 entries, 76 MB raw)
+```
+
+✅ ~5× less parse CPU — and the first poll (all misses) is most of what’s left. The steadier the fleet, the bigger the win.
+
+### 🔹 In a poller
+
+```python
+from parse_cache import ParseCache, cached_command
+from ssh_pool import SessionPool
+
+pool, cache = SessionPool(), ParseCache(max_entries=5000)
+rows = cached_command(pool, cache, cisco_router, "show ip interface brief")
+down = [r.interface for r in rows if r.status != "up"]
+```
+
+> ⚠️ Cached results are **shared** — a hit returns the very same tuple as last time. Keep parsed results immutable (tuples of namedtuples, as the Section 4 templates produce); never append to them.
+
+> 🧠 Outputs with a clock or counters in them (`show clock`, `show interfaces` packet counters) change every poll — the cache can’t help there, so don’t route them through it.
+
+---
+
+## 🧮 6. Config Delta: Push Only What Changed
+
+Stage 3 (Example 2) only *reads* from the router. The obvious way to *change* it is to send the whole intended config block:
+
+```python
+net_connect.send_config_set(intended_config.splitlines())   # 100,000 lines over SSH
+```
+
+That is slow (every line is a round trip through the CLI), and risky (re-applying `ip address`, ACLs, routing config on a live core router).
+Instead, compare **running** vs **intended** locally and send only the difference.
+
+| Step             | How                                                                    | Cost          |
+| ---------------- | ---------------------------------------------------------------------- | ------------- |
+| Parse            | Indentation → nested dicts `{line: {child: {...}}}`, one pass with a stack | O(lines)  |
+| Compare          | Dict lookups per level; identical subtrees skipped with one `==`       | O(lines)      |
+| Emit             | Removals first, then additions in intended order; enter/`exit` parent blocks only when something inside changed | O(changes) |
+
+Rules it follows:
+
+* Line only in running → `no <line>` (a whole block: `no interface Loopback5` — one command)
+* Line only in intended → the line, plus its whole block
+* `X` ↔ `no X` flips → just send the new line
+* Single-value commands (`description`, `hostname`, `mtu` …) → send the new value, no `no` for the old one
+* Order-sensitive blocks (`ip access-list`, `route-map`, `ip prefix-list`) → any change rebuilds the block
+
+### 🔹 Code
+
+```python
+# config_diff.py
+IGNORE = ("!", "Building configuration", "Current configuration")  # prefixes; "end" alone is skipped too
+ORDERED = ("ip access-list", "ipv6 access-list", "route-map", "ip prefix-list")
+# single-value commands: setting a new value replaces the old one, no "no ..." needed
+REPLACES = ("hostname ", "description ", "mtu ", "bandwidth ", "speed ", "duplex ")
+
+
+class Repeat(str):
+    """The ``n``-th identical sibling line (n >= 2): prints as the line, keyed apart from it."""
+
+    def __new__(cls, line, n):
+        self = super().__new__(cls, line)
+        self.n = n
+        return self
+
+    def __eq__(self, other):
+        return str.__eq__(self, other) and getattr(other, "n", 1) == self.n
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((str(self), self.n))
+
+
+def parse_config(text):
+    """Indented IOS-style config -> nested dicts {line: {child line: {...}}}. One pass, O(lines).
+
+    Repeated identical siblings (two equal ``remark`` lines, say) are kept as
+    separate ``Repeat`` keys instead of being merged into one.
+    """
+    root = {}
+    stack = [(-1, root)]  # (indent, children)
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        stripped = line.lstrip()
+        if not stripped or stripped == "end" or stripped.startswith(IGNORE):
+            continue
+        indent = len(line) - len(stripped)
+        while indent <= stack[-1][0]:
+            stack.pop()
+        siblings = stack[-1][1]
+        key, n = stripped, 1
+        while key in siblings:
+            n += 1
+            key = Repeat(stripped, n)
+        children = siblings[key] = {}
+        stack.append((indent, children))
+    return root
+
+
+def negate(line):
+    return line[3:] if line.startswith("no ") else "no " + line
+
+
+def _block(line, children, depth):
+    """Every command needed to create ``line`` and its whole subtree."""
+    pad = " " * depth
+    yield pad + line
+    for child, grandchildren in children.items():
+        yield from _block(child, grandchildren, depth + 1)
+    if children:
+        yield pad + " exit"
+
+
+def _diff(running, intended, depth):
+    pad = " " * depth
+    adds = {line for line in intended if line not in running}
+    replaced = tuple({kw for line in adds for kw in REPLACES if line.startswith(kw)})
+    # 1. removals first, so a changed singleton ("ip address ...") is not removed after being set
+    for line in running:
+        if line in intended or negate(line) in adds:
+            continue  # kept, or the new "no X"/"X" line below flips it anyway
+        if not line.startswith(replaced):
+            yield pad + negate(line)
+    # 2. additions and changed blocks, in intended order
+    for line, children in intended.items():
+        if line not in running:
+            yield from _block(line, children, depth)
+            continue
+        current = running[line]
+        if line.startswith(ORDERED):  # order matters: any change rebuilds the whole block
+            if list(children.items()) != list(current.items()):
+                yield pad + negate(line)
+                yield from _block(line, children, depth)
+            continue
+        if children == current:
+            continue  # identical subtree: nothing to send
+        sub = list(_diff(current, children, depth + 1))
+        if sub:
+            yield pad + line
+            yield from sub
+            yield pad + " exit"
+
+
+def diff_config(running, intended):
+    """Minimal ordered commands that turn ``running`` into ``intended`` (texts or parsed trees)."""
+    if isinstance(running, str):
+        running = parse_config(running)
+    if isinstance(intended, str):
+        intended = parse_config(intended)
+    return list(_diff(running, intended, 0))
+
+
+def push_config(conn, running_text, intended_text):
+    """Send only the delta over a netmiko connection; returns the commands sent."""
+    commands = diff_config(running_text, intended_text)
+    if commands:
+        conn.send_config_set(commands, cmd_verify=False)
+    return commands
+
+
+if __name__ == "__main__":
+    import time
+
+    def build(interfaces, changed=(), removed=(), added=()):
+        lines = ["hostname core-1", "ip routing", "!"]
+        for i in range(interfaces):
+            if i in removed:
+                continue
+            lines += [f"interface TenGigabitEthernet1/{i}",
+                      f" description uplink-{i}" + ("-moved" if i in changed else ""),
+                      f" ip address 10.{i >> 8}.{i & 255}.{2 if i in changed else 1} 255.255.255.0",
+                      " no shutdown",
+                      " service-policy output QOS", "!"]
+        for i in added:
+            lines += [f"interface Loopback{i}", f" ip address 172.16.{i}.1 255.255.255.255", "!"]
+        lines += ["ip access-list extended EDGE"]
+        lines += [f" permit tcp any host 10.0.{n}.1 eq 443" for n in range(200)]
+        lines += ["router ospf 1"] + [f" network 10.{i >> 8}.{i & 255}.0 0.0.0.255 area 0"
+                                      for i in range(interfaces)]
+        return "\n".join(lines + ["end"])
+
+    for interfaces in (3_500, 7_000, 14_000):  # ~25k, 50k, 100k lines
+        running = build(interfaces)
+        intended = build(interfaces, changed={5, 999}, removed={42}, added={1, 2})
+        start = time.perf_counter()
+        commands = diff_config(running, intended)
+        took = time.perf_counter() - start
+        print(f"{running.count(chr(10)) + 1:>7} lines: diff in {took:.2f}s -> {len(commands)} commands")
+
+    print("\n".join(commands))
+    assert diff_config(intended, intended) == []
+```
+
+**Run** (generated configs up to ~100,000 lines; one interface removed, two changed, two loopbacks added):
+
+```bash
+python3 config_diff.py
+```
+
+```
+  24706 lines: diff in 0.03s -> 17 commands
+  49206 lines: diff in 0.09s -> 17 commands
+  98206 lines: diff in 0.23s -> 17 commands
+no interface TenGigabitEthernet1/42
+interface TenGigabitEthernet1/5
+ no ip address 10.0.5.1 255.255.255.0
+ description uplink-5-moved
+ ip address 10.0.5.2 255.255.255.0
+ exit
+interface TenGigabitEthernet1/999
+ no ip address 10.3.231.1 255.255.255.0
+ description uplink-999-moved
+ ip address 10.3.231.2 255.255.255.0
+ exit
+interface Loopback1
+ ip address 172.16.1.1 255.255.255.255
+ exit
+interface Loopback2
+ ip address 172.16.2.1 255.255.255.255
+ exit
+```
+
+✅ Time grows linearly with config size — and 17 commands go over SSH instead of ~100,000 lines.
+
+### 🔹 Pushing with Netmiko
+
+```python
+from netmiko import ConnectHandler
+from config_diff import push_config
+
+net_connect = ConnectHandler(**cisco_router)
+running = net_connect.send_command("show running-config")
+intended = open("core-1.cfg").read()
+sent = push_config(net_connect, running, intended)
+print(f"{len(sent)} commands sent")
+net_connect.disconnect()
+```
+
+> ⚠️ The differ knows config **syntax**, not **defaults**: if a platform hides default lines from `show running-config`, write your intended config the same way (or the diff will keep re-sending them). Run it once with `print()` instead of `push_config()` before trusting it on a new platform.
+
+> 🧠 Diff, then re-read: after pushing, `diff_config(new_running, intended)` should be `[]` — a cheap check that the device accepted everything.
+
+---
+
+## 🗂️ 7. Compact, Indexed Inventory
+
+The Stage 1 data model is one dict per router:
+
+```python
+router = {
+    "hostname": "R1",
+    "ip": "192.168.1.1",
+    "interfaces": ["Gig0/0", "Gig0/1"],
+    "status": True
+}
+```
+
+Perfect for one router. For a **million** of them:
+
+| Problem                         | Why                                                                  |
+| ------------------------------- | -------------------------------------------------------------------- |
+| Hundreds of MB – GBs of RAM     | Every dict carries a hash table, every IP is a ~60-byte string, every interface list its own list |
+| `next(r for r in routers if ...)` | A linear scan — tens of ms per lookup, forever                     |
+| “Which devices are in 10.7.0.0/20?” | Another scan + `ipaddress` object per device                     |
+
+Store **columns** instead of rows, and index them:
+
+| Column / index     | Storage                                      | Lookup                     |
+| ------------------ | -------------------------------------------- | -------------------------- |
+| `ips`              | `array('I')` — 4 bytes per device            | —                          |
+| `status`           | `bytearray` — 1 byte per device              | —                          |
+| interfaces, site   | each distinct list/name stored **once**, rows hold its number | —         |
+| hostname index     | `dict` hostname → row                        | **O(1)**                   |
+| IP / subnet index  | IPs sorted once; a prefix is a contiguous range | **O(log n)** (binary search) |
+
+Rows come back as small `__slots__` `Device` objects, built only when you ask for them.
+
+### 🔹 Code
+
+```python
+# inventory.py
+import bisect
+import csv
+import ipaddress
+import json
+import socket
+import struct
+from array import array
+
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack("!I", value))
+
+
+class Device:
+    """One row of the inventory, built on demand. ``__slots__``: no per-object ``__dict__``."""
+
+    __slots__ = ("hostname", "ip", "interfaces", "status", "site")
+
+    def __init__(self, hostname, ip, interfaces, status, site):
+        self.hostname, self.ip, self.interfaces = hostname, ip, interfaces
+        self.status, self.site = status, site
+
+    def as_dict(self):
+        """The Stage 1 ``router`` dict."""
+        return {"hostname": self.hostname, "ip": self.ip, "interfaces": list(self.interfaces),
+                "status": self.status, "site": self.site}
+
+    def __repr__(self):
+        return f"Device({self.hostname!r}, {self.ip!r}, status={self.status}, site={self.site!r})"
+
+
+class Inventory:
+    """Columnar device store: one compact column per field instead of one dict per device.
+
+    * ``ip`` is an ``array('I')`` (4 bytes per device), ``status`` a ``bytearray`` (1 byte)
+    * interface lists and site names are stored once and referenced by number —
+      a fleet has a handful of hardware models, not a million different port layouts
+    * ``get(hostname)``: dict index, O(1)
+    * ``by_ip(ip)`` / ``in_subnet(prefix)``: IPs kept sorted, so any prefix is one contiguous
+      range — binary search, O(log n) (a prefix trie flattened into an array)
+    """
+
+    def __init__(self):
+        self.hostnames = []
+        self.ips = array("I")
+        self.status = bytearray()
+        self.site_ids = array("I")
+        self.layout_ids = array("I")
+        self._sites, self._site_index = [], {}          # id <-> site name
+        self._layouts, self._layout_index = [], {}      # id <-> tuple of interface names
+        self._by_hostname = {}
+        self._sorted = None  # (sorted ips, matching row numbers), rebuilt after changes
+
+    def __len__(self):
+        return len(self.hostnames)
+
+    @staticmethod
+    def _intern(value, items, index):
+        number = index.get(value)
+        if number is None:
+            number = index[value] = len(items)
+            items.append(value)
+        return number
+
+    def add(self, hostname, ip, interfaces=(), status=True, site=""):
+        if hostname in self._by_hostname:
+            raise ValueError(f"duplicate hostname {hostname!r}")
+        address = ip_to_int(ip)
+        row = len(self.hostnames)
+        self.hostnames.append(hostname)
+        self.ips.append(address)
+        self.status.append(1 if status else 0)
+        self.site_ids.append(self._intern(site, self._sites, self._site_index))
+        self.layout_ids.append(self._intern(tuple(interfaces), self._layouts, self._layout_index))
+        self._by_hostname[hostname] = row
+        self._sorted = None
+
+    def row(self, number):
+        return Device(self.hostnames[number], int_to_ip(self.ips[number]),
+                      self._layouts[self.layout_ids[number]], bool(self.status[number]),
+                      self._sites[self.site_ids[number]])
+
+    def get(self, hostname):
+        number = self._by_hostname.get(hostname)
+        return None if number is None else self.row(number)
+
+    def _ip_index(self):
+        if self._sorted is None:
+            order = sorted(range(len(self.ips)), key=self.ips.__getitem__)
+            self._sorted = (array("I", map(self.ips.__getitem__, order)), array("I", order))
+        return self._sorted
+
+    def by_ip(self, ip):
+        ips, rows = self._ip_index()
+        address = ip_to_int(ip)
+        i = bisect.bisect_left(ips, address)
+        return self.row(rows[i]) if i < len(ips) and ips[i] == address else None
+
+    def in_subnet(self, prefix):
+        """Every device whose IP is inside ``prefix`` (e.g. ``"10.20.0.0/16"``)."""
+        ips, rows = self._ip_index()
+        net = ipaddress.ip_network(prefix, strict=False)
+        lo = bisect.bisect_left(ips, int(net.network_address))
+        hi = bisect.bisect_right(ips, int(net.broadcast_address))
+        return [self.row(rows[i]) for i in range(lo, hi)]
+
+    def set_status(self, hostname, up):
+        self.status[self._by_hostname[hostname]] = 1 if up else 0
+
+    def down(self):
+        return [self.row(i) for i, up in enumerate(self.status) if not up]
+
+    def __iter__(self):
+        return map(self.row, range(len(self)))
+
+    # ---- loaders ---------------------------------------------------------
+
+    @classmethod
+    def from_csv(cls, path):
+        """CSV with a header: ``hostname,ip,interfaces,status,site``; interfaces split by ``;``."""
+        inv = cls()
+        with open(path, newline="") as f:
+            for rec in csv.DictReader(f):
+                inv.add(rec["hostname"], rec["ip"],
+                        rec.get("interfaces", "").split(";") if rec.get("interfaces") else (),
+                        (rec.get("status") or "true").strip().lower() in ("1", "true", "up", "yes"),
+                        rec.get("site") or "")  # short rows: DictReader fills missing cells with None
+        return inv
+
+    @classmethod
+    def from_json(cls, path):
+        """A JSON list of Stage 1 ``router`` dicts (or one dict per line — JSON Lines)."""
+        inv = cls()
+        with open(path) as f:
+            first = f.read(1)
+            while first.isspace():  # pretty-printed files may start with blank lines
+                first = f.read(1)
+            f.seek(0)
+            records = json.load(f) if first == "[" else map(json.loads, filter(str.strip, f))
+            for rec in records:
+                inv.add(rec["hostname"], rec["ip"], rec.get("interfaces", ()),
+                        rec.get("status", True), rec.get("site", ""))
+        return inv
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(["hostname", "ip", "interfaces", "status", "site"])
+            for d in self:
+                out.writerow([d.hostname, d.ip, ";".join(d.interfaces), str(d.status).lower(), d.site])
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    import tracemalloc
+
+    N = 1_000_000
+    models = [[f"Gig0/{p}" for p in range(ports)] for ports in (2, 4, 8, 24, 48)]
+
+    def fleet():
+        for i in range(N):
+            yield (f"R{i}", f"10.{i >> 16}.{i >> 8 & 255}.{i & 255}", models[i % 5],
+                   i % 50 != 0, f"site{i % 800}")
+
+    # the Stage 1 model: one dict per router, found by scanning the list
+    tracemalloc.start()
+    routers = [{"hostname": h, "ip": ip, "interfaces": list(ifs), "status": up, "site": s}
+               for h, ip, ifs, up, s in fleet()]
+    dict_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for name in ("R10", "R500000", "R999999"):
+        next(r for r in routers if r["hostname"] == name)
+    scan_ms = (time.perf_counter() - start) / 3 * 1e3
+    del routers
+
+    tracemalloc.start()
+    inv = Inventory()
+    for rec in fleet():
+        inv.add(*rec)
+    inv.by_ip("10.0.0.1")  # builds the sorted IP index
+    inv_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for i in range(0, N, 1000):
+        inv.get(f"R{i}")
+        inv.by_ip(f"10.{i >> 16}.{i >> 8 & 255}.{i & 255}")
+    lookup_us = (time.perf_counter() - start) / (N // 1000) / 2 * 1e6
+    start = time.perf_counter()
+    for third in range(0, 256, 16):
+        branch = inv.in_subnet(f"10.7.{third}.0/20")
+    subnet_ms = (time.perf_counter() - start) / 16 * 1e3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.csv")
+        inv.to_csv(path)
+        start = time.perf_counter()
+        loaded = Inventory.from_csv(path)
+        load_s = time.perf_counter() - start
+
+    assert inv.get("R123456").ip == "10.1.226.64" and len(branch) == 4096 and len(loaded) == N
+    print(f"{N:,} devices")
+    print(f"list of dicts : {dict_mb:7.0f} MB, hostname lookup by scan {scan_ms:.1f} ms")
+    print(f"Inventory     : {inv_mb:7.0f} MB, hostname/IP lookup {lookup_us:.1f} us, "
+          f"/20 subnet ({len(branch)} devices) {subnet_ms:.1f} ms")
+    print(f"CSV load      : {load_s:.1f}s for {len(loaded):,} rows")
+    print(inv.get("R123456"), inv.get("R123456").interfaces)
+```
+
+**Run** (builds a million-device fleet both ways; takes about a minute):
+
+```bash
+python3 inventory.py
+```
+
+```
+1,000,000 devices
+list of dicts :     558 MB, hostname lookup by scan 34.6 ms
+Inventory     :     145 MB, hostname/IP lookup 3.3 us, /20 subnet (4096 devices) 6.5 ms
+CSV load      : 8.8s for 1,000,000 rows
+Device('R123456', '10.1.226.64', status=True, site='site256') ('Gig0/0', 'Gig0/1', 'Gig0/2', 'Gig0/3')
+```
+
+✅ ~4× less memory, lookups ~10,000× faster. (The dict side is flattered here: all its routers share 5 interface-name lists — with real, distinct strings the gap grows.)
+
+### 🔹 Using it
+
+```python
+from inventory import Inventory
+
+inv = Inventory.from_json("routers.json")        # list of Stage 1 dicts, or JSON Lines
+r1 = inv.get("R1")
+print(r1.ip, r1.interfaces, r1.status)
+print([d.hostname for d in inv.in_subnet("192.168.1.0/24")])
+inv.set_status("R1", False)
+print(inv.down())
+```
+
+Feeding the fan-out runner (Section 2) is one line:
+
+```python
+devices = [{"host": d.ip, "port": 22, "site": d.site} for d in inv.in_subnet("10.7.0.0/16")]
+```
+
+> 🧠 The store is append-only by design — inventories are reloaded, not edited row by row. Adding devices after a lookup simply re-sorts the IP index on the next IP query.
+
+> ⚠️ IPv4 only (`array('I')`). For IPv6, keep the sorted index as a list of 16-byte `ipaddress.ip_address(ip).packed` values — bytes sort the same way the integers do, so `bisect` still works.
+
+---
+
+## 📦 8. Fast File Transfer: Pipelined, Parallel SFTP
+
+The `scp` examples in the Bash notes copy one file at a time over one stream:
+
+```bash
+scp file.txt user@192.168.1.10:/home/user/
+```
+
+Fine on a LAN. Across a WAN (50–200 ms RTT), backing up 500 configs or pushing a 1 GB image is **latency-bound**:
+
+| Pattern                                   | Time goes to                                                   |
+| ----------------------------------------- | -------------------------------------------------------------- |
+| Read loop: request 32 KB → wait → repeat  | One RTT per 32 KB — 8 MB at 50 ms RTT ≈ 256 round trips        |
+| One file after another                    | Each small file costs open + stat + read + close ≈ 5–6 RTTs     |
+| One TCP connection                        | Capped by its window and by per-flow shaping on the path       |
+
+The engine fixes each one:
+
+| Technique               | How                                                                       |
+| ----------------------- | ------------------------------------------------------------------------- |
+| Pipelined requests      | Up to `IN_FLIGHT` reads (`readv`) or writes (`set_pipelined`) outstanding per stream |
+| Parallel byte ranges    | A big file is split into ranges, each fetched over its **own** pooled connection |
+| Concurrent small files  | Many files at once, one per pooled connection                              |
+| Checksums               | SHA-256 locally vs `sha256sum` on the far end — batched, one command per 100 files |
+
+### 🔹 Lab: SFTP and a slow link
+
+`FakeRouter(sftp_root=...)` (Section 0) serves a local directory as the router’s `flash:`, and `WanLink` puts a 50 ms RTT, 2 MB/s-per-connection link in front of it.
+
+### 🔹 Code
+
+```python
+# sftp_fast.py
+import concurrent.futures
+import hashlib
+import os
+import queue
+import re
+import shlex
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import paramiko
+
+from ssh_batch import connect  # Section 3
+
+BLOCK = 32768         # bytes per SFTP read/write request — what servers reliably accept
+IN_FLIGHT = 64        # outstanding requests per stream: 64 x 32 KB = 2 MB on the wire
+
+
+class TransferResult(NamedTuple):
+    path: str
+    size: int
+    seconds: float
+    ok: bool
+    error: str = ""
+
+
+class SFTPPool:
+    """``size`` logged-in SSH connections with an SFTP client each.
+
+    Separate connections mean separate TCP windows, so parallel ranges and
+    parallel small files really do travel side by side.
+    """
+
+    def __init__(self, host, username, password, port=22, size=4):
+        self.size = size
+        self._free = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            ssh = connect(host, username, password, port)
+            pair = (ssh, ssh.open_sftp())
+            self._all.append(pair)
+            self._free.put(pair)
+
+    @contextmanager
+    def sftp(self):
+        pair = self._free.get()
+        try:
+            yield pair[1]
+        finally:
+            self._free.put(pair)
+
+    def run(self, command):
+        """Run a command on one of the pooled connections; returns its output."""
+        with self.sftp() as sftp:
+            ssh = next(s for s, f in self._all if f is sftp)
+            stdin, stdout, stderr = ssh.exec_command(command)
+            return stdout.read().decode(errors="replace")
+
+    def close(self):
+        for ssh, sftp in self._all:
+            sftp.close()
+            ssh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def remote_sha256(pool, paths, batch=100, strict=True):
+    """Ask the far end to hash its copies: ``{path: sha256}``, one ``sha256sum`` per ``batch`` files.
+
+    Linux/BSD hosts and most NOS shells have ``sha256sum``; on IOS-XE use
+    ``verify /sha256 flash:<file>`` (one file per command) instead.
+    A path the far end gave no hash for raises ``ValueError`` — or, with
+    ``strict=False``, is just left out of the result.
+    """
+    hashes = {}
+    for i in range(0, len(paths), batch):
+        names = paths[i:i + batch]
+        output = pool.run("sha256sum " + " ".join(map(shlex.quote, names)))
+        for line in output.splitlines():
+            match = re.match(r"([0-9a-fA-F]{64})\s+\*?(.+)$", line.strip())
+            if match:
+                hashes[match.group(2)] = match.group(1).lower()
+    missing = [p for p in paths if p not in hashes]
+    if missing and strict:
+        raise ValueError(f"no SHA-256 from the remote side for {missing[:3]}")
+    return hashes
+
+
+def _ranges(size, parts):
+    step = max(BLOCK, -(-size // parts // BLOCK) * BLOCK)  # ceil, whole blocks
+    return [(start, min(step, size - start)) for start in range(0, size, step)]
+
+
+def _get_range(pool, remote, local, offset, length):
+    chunks = [(pos, min(BLOCK, offset + length - pos)) for pos in range(offset, offset + length, BLOCK)]
+    with pool.sftp() as sftp, sftp.open(remote, "rb") as src, open(local, "r+b") as dst:
+        dst.seek(offset)
+        for data in src.readv(chunks, max_concurrent_prefetch_requests=IN_FLIGHT):
+            dst.write(data)  # requests are all in flight; answers arrive in order
+
+
+def _put_range(pool, local, remote, offset, length):
+    with pool.sftp() as sftp, sftp.open(remote, "r+b") as dst, open(local, "rb") as src:
+        dst.set_pipelined(True)  # don't wait for each write's ack; errors surface at close()
+        dst.seek(offset)
+        src.seek(offset)
+        remaining = length
+        while remaining:
+            data = src.read(min(BLOCK, remaining))
+            dst.write(data)
+            remaining -= len(data)
+
+
+def download(pool, remote, local, parts=None, verify=True):
+    """Fetch one (large) file as ``parts`` byte ranges over separate pooled connections."""
+    start = time.perf_counter()
+    with pool.sftp() as sftp:
+        size = sftp.stat(remote).st_size
+    with open(local, "wb") as f:
+        f.truncate(size)  # ranges write into place
+    ranges = _ranges(size, parts or pool.size)
+    if ranges:  # an empty file has none: nothing to fetch, just verify
+        with concurrent.futures.ThreadPoolExecutor(len(ranges)) as ex:
+            for future in [ex.submit(_get_range, pool, remote, local, o, n) for o, n in ranges]:
+                future.result()
+    ok = not verify or sha256_file(local) == remote_sha256(pool, [remote])[remote]
+    return TransferResult(remote, size, time.perf_counter() - start, ok,
+                          "" if ok else "checksum mismatch")
+
+
+def upload(pool, local, remote, parts=None, verify=True):
+    """Send one (large) file as ``parts`` byte ranges over separate pooled connections."""
+    start = time.perf_counter()
+    size = os.path.getsize(local)
+    with pool.sftp() as sftp:
+        sftp.open(remote, "wb").close()  # create/empty it; ranges write into place
+    ranges = _ranges(size, parts or pool.size)
+    if ranges:
+        with concurrent.futures.ThreadPoolExecutor(len(ranges)) as ex:
+            for future in [ex.submit(_put_range, pool, local, remote, o, n) for o, n in ranges]:
+                future.result()
+    ok = not verify or sha256_file(local) == remote_sha256(pool, [remote])[remote]
+    return TransferResult(remote, size, time.perf_counter() - start, ok,
+                          "" if ok else "checksum mismatch")
+
+
+def _get_one(pool, remote, local):
+    start = time.perf_counter()
+    try:
+        with pool.sftp() as sftp:
+            sftp.get(remote, local, max_concurrent_prefetch_requests=IN_FLIGHT)
+        return TransferResult(remote, os.path.getsize(local), time.perf_counter() - start, True)
+    except (OSError, paramiko.SSHException) as e:
+        return TransferResult(remote, 0, time.perf_counter() - start, False,
+                              f"{type(e).__name__}: {e}")
+
+
+def download_many(pool, pairs, verify=True):
+    """Fetch many (small) files, one per pooled connection at a time.
+
+    Returns a ``TransferResult`` per file, in ``pairs`` order. Checksums are
+    fetched afterwards in batches — one remote command for up to 100 files;
+    a file the far end can't hash is marked failed on its own, not the batch.
+    """
+    with concurrent.futures.ThreadPoolExecutor(pool.size) as ex:
+        results = list(ex.map(lambda pair: _get_one(pool, *pair), pairs))
+    if verify:
+        done = [(r, local) for r, (_, local) in zip(results, pairs) if r.ok]
+        remote = remote_sha256(pool, [r.path for r, _ in done], strict=False)
+        bad = {r.path: "checksum mismatch" if r.path in remote else "no remote checksum"
+               for r, local in done if sha256_file(local) != remote.get(r.path)}
+        results = [r._replace(ok=False, error=bad[r.path]) if r.path in bad else r
+                   for r in results]
+    return results
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from fake_router import FakeRouter, WanLink
+
+    flash = tempfile.mkdtemp()   # the router's flash:
+    backups = tempfile.mkdtemp()  # where the copies go
+    with open(os.path.join(flash, "c8000v-universalk9.bin"), "wb") as f:
+        f.write(os.urandom(8 * 1024 * 1024))
+    configs = [f"R{n}-confg" for n in range(100)]
+    for name in configs:
+        with open(os.path.join(flash, name), "wb") as f:
+            f.write(os.urandom(6000))
+    open(os.path.join(flash, "empty-confg"), "wb").close()  # zero bytes: no ranges at all
+
+    # 50 ms RTT, each TCP connection shaped to 2 MB/s
+    with FakeRouter(sftp_root=flash) as router, \
+            WanLink(router.host, router.port, rtt=0.05, rate=2_000_000) as wan:
+        # one file at a time, one request at a time (what a naive copy loop does)
+        ssh = connect(wan.host, router.username, router.password, wan.port)
+        sftp = ssh.open_sftp()
+        start = time.perf_counter()
+        with sftp.open("c8000v-universalk9.bin", "rb") as src, \
+                open(os.path.join(backups, "naive.bin"), "wb") as dst:
+            while data := src.read(BLOCK):
+                dst.write(data)
+        naive_image = time.perf_counter() - start
+        start = time.perf_counter()
+        sftp.get("c8000v-universalk9.bin", os.path.join(backups, "get.bin"))
+        one_stream = time.perf_counter() - start  # paramiko's get() already pipelines reads
+        start = time.perf_counter()
+        for name in configs:
+            sftp.get(name, os.path.join(backups, name))
+        serial_configs = time.perf_counter() - start
+        sftp.close()
+        ssh.close()
+
+        with SFTPPool(wan.host, router.username, router.password, port=wan.port, size=8) as pool:
+            image = download(pool, "c8000v-universalk9.bin", os.path.join(backups, "fast.bin"))
+            empty = download(pool, "empty-confg", os.path.join(backups, "empty-confg"))
+            start = time.perf_counter()
+            results = download_many(pool, [(n, os.path.join(backups, n)) for n in configs])
+            many = time.perf_counter() - start
+
+    assert image.ok and empty.ok and empty.size == 0 and all(r.ok for r in results)
+    print("50 ms RTT, 2 MB/s per connection:")
+    print(f"8 MB image  : {naive_image:6.2f}s one request at a time, {one_stream:.2f}s sftp.get(), "
+          f"{image.seconds:.2f}s in 8 ranges (SHA-256 ok)")
+    print(f"100 configs : {serial_configs:6.2f}s one file at a time, "
+          f"{many:.2f}s 8 at a time (all SHA-256 ok)")
+    print(f"empty config: {empty.size} bytes in {empty.seconds:.2f}s (SHA-256 ok)")
+```
+
+**Run** (about a minute — the slow baselines are slow):
+
+```bash
+python3 sftp_fast.py
+```
+
+```
+50 ms RTT, 2 MB/s per connection:
+8 MB image  :  15.40s one request at a time, 4.47s sftp.get(), 0.92s in 8 ranges (SHA-256 ok)
+100 configs :  30.99s one file at a time, 4.24s 8 at a time (all SHA-256 ok)
+empty config: 0 bytes in 0.16s (SHA-256 ok)
+```
+
+✅ Image: paramiko’s own `get()` already pipelines (3× over the read loop); ranges over 8 connections beat the per-connection cap for another 5×.
+✅ Configs: ~7× faster, checksums included.
+✅ A zero-byte file skips the range pool and goes straight to the checksum; in `download_many()` a file the far end can’t hash fails alone (`"no remote checksum"`), not the whole batch.
+
+> 🧠 Without a per-connection cap (plain `127.0.0.1`, or a fat uncongested link) one pipelined `get()` already fills the pipe and extra ranges add nothing — measure your own path before raising `parts`.
+
+### 🔹 Backing up a fleet
+
+```python
+from sftp_fast import SFTPPool, download_many
+
+with SFTPPool("192.168.1.10", "admin", "admin123", size=8) as pool:
+    results = download_many(pool, [(f"{name}", f"backups/{name}") for name in ("startup-config", "vlan.dat")])
+    for r in results:
+        print(r.path, "OK" if r.ok else r.error)
+```
+
+> ⚠️ Routers limit concurrent SSH sessions (VTY lines) — 4–8 per device is a sane `size`. Many devices? Give each device its own small pool and fan out across devices (Section 2).
+
+---
+
+## 🚦 9. Priority Job Scheduler: Urgent Checks Before Bulk Backups
+
+Every snippet so far is fire-and-forget: the Stage 4 thread pool, Section 2’s fan-out, a loop of `ConnectHandler` calls. A pool runs jobs **in the order they were submitted**, so once the nightly backup is queued (200 × `show running-config`), an urgent `show interfaces` on a router that just went down waits behind **all of it**.
+
+`scheduler.py` decides *what runs next* instead of just *how many run at once*:
+
+| Feature                    | How                                                                          |
+| -------------------------- | ---------------------------------------------------------------------------- |
+| Priority queues            | `URGENT` / `NORMAL` / `BULK` (any int) — one heap, first come first served within a priority |
+| Per-device mutual exclusion | Never two jobs on one router at once (one VTY, no config-mode clashes)      |
+| Per-site caps              | `per_site=` / `site_limits={site: n}` — same idea as Section 2              |
+| Deadlines                  | `deadline=` seconds: a job that can’t **start** in time is dropped, not run late |
+| Retries                    | `retries=` with **jittered** exponential backoff (`backoff × 2ⁿ`, random in `[0, cap]`) |
+| Metrics                    | Queue depth per priority, running per site, wait-time p50/p90/p99 per priority (waits up to a day, ~3 % error) |
+| Two backends               | `ThreadScheduler` (blocking netmiko/paramiko) and `AsyncScheduler` (`asyncio`) |
+
+How it works:
+
+* A job whose device is busy, or whose site is at its cap, is **parked** on that device/site — the dispatcher never re-scans blocked jobs, so a 100k-job backlog costs O(log n) per dispatch
+* When a job finishes, the next parked job of its device and its site goes back into the ready heap
+* Retries wait in a separate heap ordered by due time; idle workers sleep exactly until the next one is due
+* Wait times go into the bounded-memory `RttWindow` histograms from `3_Fast Sweeps.py` (Section 9) — copy `rtt_stats.py` next to this file. Their default range stops at 60 s (plenty for RTTs, not for a backed-up queue), so the scheduler asks for `max_us=MAX_WAIT_US` (one day)
+
+### 🔹 Code
+
+```python
+# scheduler.py
+import asyncio
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from rtt_stats import RttWindow  # 3_Fast Sweeps.py, Section 9
+
+URGENT, NORMAL, BULK = 0, 1, 2   # lower number runs first; any int works
+MAX_WAIT_US = 86_400 * 10**6     # wait histograms reach a day (RttWindow's default stops at 60 s)
+NAMES = {URGENT: "urgent", NORMAL: "normal", BULK: "bulk"}
+
+
+class JobResult(NamedTuple):
+    name: str
+    device: Any
+    ok: bool
+    value: Any
+    error: Optional[str]
+    attempts: int
+    waited: float    # seconds queued (all attempts) before it started
+    seconds: float   # seconds running (last attempt)
+
+
+class Job:
+    __slots__ = ("fn", "args", "kwargs", "name", "device", "site", "priority", "deadline",
+                 "retries", "retry_on", "attempts", "seq", "ready_at", "waited", "future")
+
+    def __init__(self, fn, args, kwargs, name, device, site, priority, deadline, retries, retry_on):
+        self.fn, self.args, self.kwargs, self.name = fn, args, kwargs, name
+        self.device, self.site, self.priority = device, site, priority
+        self.deadline, self.retries, self.retry_on = deadline, retries, retry_on
+        self.attempts, self.waited, self.future = 0, 0.0, None
+
+    def __lt__(self, other):  # heap order: priority, then first come first served
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def device_key(device):
+    """Section 1/2 device dicts -> ``(host, port)``; anything hashable is used as is."""
+    if isinstance(device, dict):
+        return device["host"], device.get("port", 22)
+    return device
+
+
+class _Core:
+    """The bookkeeping both schedulers share; callers hold their own lock.
+
+    * ``_ready``: one heap of runnable jobs, ordered by (priority, arrival)
+    * a job whose device is busy, or whose site is at its cap, is **parked** on that
+      device/site instead of being re-scanned on every dispatch — it goes back into
+      ``_ready`` when the device/site frees a slot
+    * ``_delayed``: retries waiting out their backoff, ordered by due time
+    """
+
+    def __init__(self, per_site=None, site_limits=None, backoff=0.5, max_backoff=30.0,
+                 window=60.0):
+        self.per_site = per_site
+        self.site_limits = site_limits or {}
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.window = window
+        self._seq = itertools.count()
+        self._ready = []
+        self._delayed = []
+        self._device_park = collections.defaultdict(list)
+        self._site_park = collections.defaultdict(list)
+        self._busy = set()
+        self._site_running = collections.Counter()
+        self.queued = collections.Counter()    # priority -> jobs waiting (ready or parked)
+        self.waits = {}                         # priority -> RttWindow of wait times
+        self.running = 0
+        self.counts = collections.Counter()    # done / failed / expired / retried
+
+    def __len__(self):
+        """Jobs not finished yet: queued, backing off or running."""
+        return sum(self.queued.values()) + len(self._delayed) + self.running
+
+    def _limit(self, site):
+        return self.site_limits.get(site, self.per_site)
+
+    def add(self, job, now):
+        job.seq = next(self._seq)
+        job.ready_at = now
+        self.queued[job.priority] += 1
+        heapq.heappush(self._ready, job)
+
+    def _unpark(self, key, site):
+        # one parked job per freed device is enough: the device runs one job at a time anyway
+        if self._device_park.get(key):
+            heapq.heappush(self._ready, heapq.heappop(self._device_park[key]))
+        # the freed site slot goes to the best site-parked job whose device is free; the
+        # ones in front of it whose device is busy move to that device's park instead
+        park = self._site_park.get(site)
+        while park:
+            job = heapq.heappop(park)
+            job_key = device_key(job.device)
+            if job_key in self._busy:
+                heapq.heappush(self._device_park[job_key], job)
+                continue
+            heapq.heappush(self._ready, job)
+            break
+
+    def next_job(self, now):
+        """``(job to start or None, [expired jobs], seconds until a retry is due or None)``."""
+        expired = []
+        while self._delayed and self._delayed[0][0] <= now:
+            self.add(heapq.heappop(self._delayed)[2], now)
+        while self._ready:
+            job = heapq.heappop(self._ready)
+            key = device_key(job.device)
+            if job.deadline is not None and now >= job.deadline:
+                self.queued[job.priority] -= 1
+                job.waited += now - job.ready_at
+                expired.append(job)
+                self.counts["expired"] += 1
+                self._unpark(key, job.site)  # it may have held a parked job's turn
+                continue
+            if key in self._busy:
+                heapq.heappush(self._device_park[key], job)
+                continue
+            limit = self._limit(job.site)
+            if limit is not None and self._site_running[job.site] >= limit:
+                heapq.heappush(self._site_park[job.site], job)
+                continue
+            self._busy.add(key)
+            self._site_running[job.site] += 1
+            self.running += 1
+            self.queued[job.priority] -= 1
+            waited = now - job.ready_at
+            job.waited += waited
+            job.attempts += 1
+            if job.priority not in self.waits:
+                self.waits[job.priority] = RttWindow(self.window, max_us=MAX_WAIT_US)
+            self.waits[job.priority].record(waited, now)
+            return job, expired, None
+        return None, expired, (self._delayed[0][0] - now) if self._delayed else None
+
+    def finish(self, job, error, now):
+        """Release the job's device and site; ``True`` if it was queued again for a retry."""
+        key = device_key(job.device)
+        self._busy.discard(key)
+        self._site_running[job.site] -= 1
+        self.running -= 1
+        self._unpark(key, job.site)
+        if error is None:
+            self.counts["done"] += 1
+            return False
+        if job.attempts <= job.retries:
+            # "full jitter": a random delay up to the exponential cap, so devices that
+            # failed together (a flapping WAN link) don't all come back at once
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (job.attempts - 1)))
+            if job.deadline is None or now + delay < job.deadline:
+                self.counts["retried"] += 1
+                job.ready_at = now + delay
+                heapq.heappush(self._delayed, (job.ready_at, next(self._seq), job))
+                return True
+        self.counts["failed"] += 1
+        return False
+
+    def metrics(self, now):
+        return {
+            "queued": {NAMES.get(p, p): n for p, n in sorted(self.queued.items()) if n},
+            "backing_off": len(self._delayed),
+            "running": self.running,
+            "running_per_site": {s: n for s, n in self._site_running.items() if n},
+            "wait_ms": {NAMES.get(p, p): w.snapshot(now) for p, w in sorted(self.waits.items())},
+            **{k: self.counts[k] for k in ("done", "failed", "expired", "retried")},
+        }
+
+
+def _error(exc):
+    first_line = (str(exc).strip().splitlines() or [""])[0]
+    return f"{type(exc).__name__}: {first_line}"
+
+
+def _make_job(fn, args, kwargs, device, site, priority, deadline, retries, retry_on, name, now):
+    if site is None and isinstance(device, dict):
+        site = device.get("site")
+    return Job(fn, args, kwargs, name or getattr(fn, "__name__", "job"), device, site, priority,
+               None if deadline is None else now + deadline, retries, retry_on)
+
+
+class ThreadScheduler:
+    """Priority scheduler on ``workers`` threads — for blocking netmiko/paramiko calls.
+
+    ``submit()`` returns a ``concurrent.futures.Future`` that resolves to a ``JobResult``
+    (failures are results too, never exceptions).
+    """
+
+    def __init__(self, workers=16, per_site=None, site_limits=None, backoff=0.5, max_backoff=30.0):
+        self._core = _Core(per_site, site_limits, backoff, max_backoff)
+        self._cond = threading.Condition()
+        self._closing = False
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, *args, device, site=None, priority=NORMAL, deadline=None, retries=2,
+               retry_on=(Exception,), name=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` to run on ``device``.
+
+        ``deadline``: seconds from now after which the job must not *start* (or retry).
+        ``retries``: extra attempts after an exception listed in ``retry_on``.
+        """
+        job = _make_job(fn, args, kwargs, device, site, priority, deadline, retries, retry_on,
+                        name, time.monotonic())
+        job.future = concurrent.futures.Future()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("scheduler is shut down")
+            self._core.add(job, time.monotonic())
+            self._cond.notify()
+        return job.future
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    job, expired, sleep = self._core.next_job(time.monotonic())
+                    for dead in expired:
+                        dead.future.set_result(JobResult(dead.name, dead.device, False, None,
+                                                         "deadline expired", dead.attempts,
+                                                         dead.waited, 0.0))
+                    if job is not None:
+                        break
+                    if self._closing and not len(self._core):
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(sleep)
+            start = time.monotonic()
+            try:
+                value, error = job.fn(*job.args, **job.kwargs), None
+            except job.retry_on as exc:
+                value, error = None, _error(exc)
+            except Exception as exc:
+                value, error = None, _error(exc)
+                job.retries = 0  # not a retryable error
+            end = time.monotonic()
+            with self._cond:
+                again = self._core.finish(job, error, end)
+                self._cond.notify_all()  # a device/site slot (or a retry) may be free now
+            if not again:
+                job.future.set_result(JobResult(job.name, job.device, error is None, value, error,
+                                                job.attempts, job.waited, end - start))
+
+    def metrics(self):
+        with self._cond:
+            return self._core.metrics(time.monotonic())
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; the workers exit once everything queued has finished."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class AsyncScheduler:
+    """The same scheduler on ``asyncio``: ``workers`` tasks in the running loop.
+
+    Coroutine functions are awaited (and cancelled at the deadline); plain
+    functions run in a thread via ``asyncio.to_thread`` — a thread can't be
+    cancelled, so for them the deadline only gates the start, as in ``ThreadScheduler``.
+    """
+
+    def __init__(self, workers=16, per_site=None, site_limits=None, backoff=0.5, max_backoff=30.0):
+        self._core = _Core(per_site, site_limits, backoff, max_backoff)
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    def submit(self, fn, *args, device, site=None, priority=NORMAL, deadline=None, retries=2,
+               retry_on=(Exception,), name=None, **kwargs):
+        """Like ``ThreadScheduler.submit``; returns an ``asyncio.Future``."""
+        if self._closing:
+            raise RuntimeError("scheduler is shut down")
+        job = _make_job(fn, args, kwargs, device, site, priority, deadline, retries, retry_on,
+                        name, time.monotonic())
+        job.future = asyncio.get_running_loop().create_future()
+        self._core.add(job, time.monotonic())
+        self._wake.set()
+        return job.future
+
+    async def _call(self, job):
+        if not asyncio.iscoroutinefunction(job.fn):
+            # no wait_for here: the thread would keep running on the device after
+            # the timeout, while finish() hands the device to the next job
+            return await asyncio.to_thread(job.fn, *job.args, **job.kwargs)
+        call = job.fn(*job.args, **job.kwargs)
+        if job.deadline is None:
+            return await call
+        return await asyncio.wait_for(call, max(0.0, job.deadline - time.monotonic()))
+
+    async def _worker(self):
+        while True:
+            job, expired, sleep = self._core.next_job(time.monotonic())
+            for dead in expired:
+                dead.future.set_result(JobResult(dead.name, dead.device, False, None,
+                                                 "deadline expired", dead.attempts,
+                                                 dead.waited, 0.0))
+            if job is None:
+                if self._closing and not len(self._core):
+                    self._wake.set()  # let the other workers see it too
+                    return
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), sleep)
+                except asyncio.TimeoutError:
+                    pass  # a retry is due
+                continue
+            start = time.monotonic()
+            try:
+                value, error = await self._call(job), None
+            except asyncio.TimeoutError:
+                value, error = None, "deadline expired while running"
+                job.retries = 0
+            except job.retry_on as exc:
+                value, error = None, _error(exc)
+            except Exception as exc:
+                value, error = None, _error(exc)
+                job.retries = 0
+            end = time.monotonic()
+            if not self._core.finish(job, error, end):
+                job.future.set_result(JobResult(job.name, job.device, error is None, value, error,
+                                                job.attempts, job.waited, end - start))
+            self._wake.set()
+
+    def metrics(self):
+        return self._core.metrics(time.monotonic())
+
+    async def shutdown(self):
+        """Stop accepting jobs and wait for everything queued to finish."""
+        self._closing = True
+        self._wake.set()
+        await asyncio.gather(*self._tasks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.shutdown()
+
+
+if __name__ == "__main__":
+    import statistics
+
+    random.seed(7)
+    devices = [{"host": f"10.0.{n // 10}.{n % 10 + 1}", "site": f"site{n // 10}"} for n in range(40)]
+    flaky = {"left": 2}  # R0 refuses the first two logins
+    running = collections.Counter()
+    peak = collections.Counter()
+    lock = threading.Lock()
+
+    def backup(device, seconds=0.2):  # stand-in for a netmiko "show running-config"
+        with lock:
+            running[device["host"]] += 1
+            peak[device["host"]] = max(peak[device["host"]], running[device["host"]])
+        try:
+            time.sleep(seconds)
+        finally:
+            with lock:
+                running[device["host"]] -= 1
+        return "config"
+
+    def check(device):
+        if device is devices[0] and flaky["left"]:
+            flaky["left"] -= 1
+            raise ConnectionResetError("connection reset by peer")
+        return backup(device, 0.02)
+
+    def percentiles(waits):
+        q = statistics.quantiles(waits, n=20)
+        return f"p50 {statistics.median(waits):5.2f}s  p95 {q[18]:5.2f}s"
+
+    urgent_at = 0.5  # checks arrive half a second after the nightly backups were queued
+    targets = [devices[0]] + random.sample(devices[1:], 19)
+
+    # FIFO thread pool: what the Stage 4 ThreadPoolExecutor does
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        t0 = time.monotonic()
+        for d in devices * 5:
+            pool.submit(backup, d)
+        time.sleep(urgent_at)
+        submitted = time.monotonic()
+        started = []
+
+        def timed_check(device):
+            started.append(time.monotonic() - submitted)
+            try:
+                return check(device)
+            except OSError:
+                return None  # a plain pool has no retry
+        for d in targets:
+            pool.submit(timed_check, d)
+    fifo_total = time.monotonic() - t0
+    print(f"FIFO pool     : urgent wait {percentiles(started)}   all done {fifo_total:.1f}s")
+
+    flaky["left"] = 2
+    peak.clear()
+    with ThreadScheduler(workers=8, per_site=3, backoff=0.05) as sched:
+        t0 = time.monotonic()
+        backups = [sched.submit(backup, d, device=d, priority=BULK, name="backup")
+                   for d in devices * 5]
+        # a compliance report that is useless after 1.5 s
+        late = [sched.submit(backup, d, device=d, priority=BULK, deadline=1.5, name="report")
+                for d in devices[:10]]
+        time.sleep(urgent_at)
+        checks = [sched.submit(check, d, device=d, priority=URGENT, name="check") for d in targets]
+        time.sleep(0.1)
+        snapshot = sched.metrics()
+    total = time.monotonic() - t0
+    urgent = [f.result() for f in checks]
+    m = sched.metrics()
+    print(f"ThreadScheduler: urgent wait {percentiles([r.waited for r in urgent])}   "
+          f"all done {total:.1f}s")
+    print(f"  0.6s in: queued {snapshot['queued']}, running {snapshot['running']}, "
+          f"per site {snapshot['running_per_site']}")
+    print(f"  {m['done']} done, {m['retried']} retried, {m['expired']} expired, {m['failed']} failed; "
+          f"R0 check ok after {urgent[0].attempts} attempts")
+    print(f"  wait p50/p99 ms: { {p: (w['p50'], w['p99']) for p, w in m['wait_ms'].items()} }")
+    assert max(peak.values()) == 1, "two jobs ran on one device at once"
+    assert all(r.ok for r in urgent) and all(f.result().ok for f in backups)
+
+    async def main():
+        async def abackup(device, seconds=0.2):
+            await asyncio.sleep(seconds)
+            return "config"
+
+        async def acheck(device):
+            if device is devices[0] and flaky["left"]:
+                flaky["left"] -= 1
+                raise ConnectionResetError("connection reset by peer")
+            return await abackup(device, 0.02)
+
+        flaky["left"] = 2
+        async with AsyncScheduler(workers=8, per_site=3, backoff=0.05) as sched:
+            t0 = time.monotonic()
+            for d in devices * 5:
+                sched.submit(abackup, d, device=d, priority=BULK)
+            await asyncio.sleep(urgent_at)
+            checks = [sched.submit(acheck, d, device=d, priority=URGENT) for d in targets]
+            slow = sched.submit(abackup, devices[5], 5.0, device=devices[5], deadline=1.0)
+            urgent = await asyncio.gather(*checks)
+        m = sched.metrics()
+        print(f"AsyncScheduler : urgent wait {percentiles([r.waited for r in urgent])}   "
+              f"all done {time.monotonic() - t0:.1f}s")
+        print(f"  {m['done']} done, {m['retried']} retried, {m['failed']} failed "
+              f"(5 s job cut at its 1 s deadline: {slow.result().error!r})")
+
+    asyncio.run(main())
+```
+
+**Run** (simulated jobs: 200 backups of 0.2 s on 40 devices in 4 sites, 20 urgent checks arriving 0.5 s later, 8 workers):
+
+```bash
+python3 scheduler.py
+```
+
+```
+FIFO pool     : urgent wait p50  4.52s  p95  4.55s   all done 5.1s
+ThreadScheduler: urgent wait p50  0.12s  p95  0.14s   all done 5.3s
+  0.6s in: queued {'urgent': 20, 'bulk': 186}, running 8, per site {'site0': 3, 'site1': 3, 'site2': 2}
+  220 done, 2 retried, 10 expired, 0 failed; R0 check ok after 3 attempts
+  wait p50/p99 ms: {'urgent': (101.376, 141.311), 'bulk': (2457.599, 5046.271)}
+AsyncScheduler : urgent wait p50  0.12s  p95  0.15s   all done 5.5s
+  220 done, 2 retried, 1 failed (5 s job cut at its 1 s deadline: 'deadline expired while running')
+```
+
+✅ Urgent checks wait ~0.1 s (for a worker to finish its current backup) instead of ~4.5 s behind the whole queue — and the backup still finishes in about the same total time.
+✅ R0’s check survives two connection resets (retried with backoff); the ten reports that couldn’t start within 1.5 s were dropped, not run late.
+
+> 🧠 A thread can’t be interrupted, so for blocking calls a deadline only gates *starting* (and retrying) — in `ThreadScheduler` and for plain functions in `AsyncScheduler` alike. Only a coroutine still running at its deadline is cancelled, and the device is released after the cancellation has finished, never while the call is still talking to it.
+
+### 🔹 With netmiko and the session pool
+
+```python
+from bulk_run import read_inventory, run_commands   # Section 2
+from scheduler import BULK, URGENT, ThreadScheduler
+from ssh_pool import SessionPool                     # Section 1
+
+credentials = {"device_type": "cisco_ios", "username": "admin", "password": "admin123"}
+devices = [{**credentials, **d} for d in read_inventory("devices.txt")]
+pool = SessionPool(max_per_device=1)
+
+with ThreadScheduler(workers=32, per_site=5) as sched:
+    backups = [sched.submit(run_commands, d, ["show running-config"], pool,
+                            device=d, priority=BULK, deadline=3600) for d in devices]
+    check = sched.submit(run_commands, devices[0], ["show interfaces"], pool,
+                         device=devices[0], priority=URGENT, retries=3)
+    print(check.result().value)
+    print(sched.metrics())
+```
+
+> ⚠️ Only retry what is safe to repeat. `show` commands are; a half-applied `send_config_set()` may not be — submit config pushes with `retries=0`, or pass `retry_on=(TimeoutError, ConnectionError)` so only failures *before* anything was sent come back.
+
+---